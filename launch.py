@@ -64,9 +64,17 @@ def extract_text_files():
 
 def parse_linux_datatimes():
     """
-    Calls parse_linux_datatime.py in scripts/ to parse Linux logs for timestamps.
+    Calls parse_linux_datetime.py in scripts/ to parse Linux logs for timestamps.
     """
-    script_path = os.path.join('scripts', 'parse_linux_datatime.py')
+    script_path = os.path.join('scripts', 'parse_linux_datetime.py')
+    subprocess.run(["python", script_path])
+
+def search_columns():
+    """
+    Calls search_columns.py in scripts/ to search chosen columns of CSV/Parquet files 
+    (e.g. EZ tool output) with vectorized string matching.
+    """
+    script_path = os.path.join('scripts', 'search_columns.py')
     subprocess.run(["python", script_path])
 
 def search_freesearch():
@@ -76,9 +84,18 @@ def search_freesearch():
     script_path = os.path.join('scripts', 'search_freesearch.py')
     subprocess.run(["python", script_path])
 
+def extract_iocs():
+    """
+    Calls extract_iocs.py in scripts/ to extract IPv4/IPv6 addresses, domains, URLs, 
+    email addresses and hashes from cleartext files in one pass.
+    """
+    script_path = os.path.join('scripts', 'extract_iocs.py')
+    subprocess.run(["python", script_path])
+
 def search_ipv4():
     """
-    Calls search_ipv4.py in scripts/ to search cleartext files for IPv4 addresses.
+    Calls search_ipv4.py in scripts/ to search cleartext files for IPv4 addresses,
+    optionally only those inside the CIDR ranges of input_watchlist.txt.
     """
     script_path = os.path.join('scripts', 'search_ipv4.py')
     subprocess.run(["python", script_path])
@@ -99,6 +116,14 @@ def search_wordlist():
     script_path = os.path.join('scripts', 'search_wordlist.py')
     subprocess.run(["python", script_path])
 
+def build_trigram_index():
+    """
+    Calls build_trigram_index.py in scripts/ to index _input into tmp/ 
+    for faster repeated free-text, regex and wordlist searches.
+    """
+    script_path = os.path.join('scripts', 'build_trigram_index.py')
+    subprocess.run(["python", script_path])
+
 def triage_hayabusa_timeline():
     """
     Calls triage_hayabusa_timeline.py in scripts/ to run 'hayabusa csv-timeline'.
@@ -399,14 +424,17 @@ Note: Input files (.evtx, .log, .mdb, etc) need to be placed within the _input d
 		print("17) Parse      | Linux datetimes in logs    | {*.log}")
 
 		# -- Search --
-		print("18) Search     | Free-text                  | {*.csv, *.txt, etc}")
-		print("19) Search     | IPv4                       | {*.csv, *.txt, etc}")
-		print("20) Search     | Regex                      | {input_regex.txt}")
-		print("21) Search     | Wordlist                   | {input_wordlist.txt}")
+		print("18) Search     | Columns.CSV/Parquet        | {*.csv, *.parquet}")
+		print("19) Search     | Free-text                  | {*.csv, *.txt, etc}")
+		print("20) Search     | IOCs.Extract all           | {*.csv, *.txt, etc}")
+		print("21) Search     | IPv4                       | {*.csv, *.txt, input_watchlist.txt}")
+		print("22) Search     | Regex                      | {input_regex.txt}")
+		print("23) Search     | Wordlist                   | {input_wordlist.txt}")
+		print("24) Search     | Trigram index.Build        | {tmp/trigram_index.sqlite}")
 
 		# -- Triage --
-		print("22) Triage     | Hayabusa.Logons            | {*.evtx}")
-		print("23) Triage     | Hayabusa.Timeline          | {*.evtx}")
+		print("25) Triage     | Hayabusa.Logons            | {*.evtx}")
+		print("26) Triage     | Hayabusa.Timeline          | {*.evtx}")
 
 		choice = input("\nEnter your choice: ").strip()
 
@@ -456,18 +484,24 @@ Note: Input files (.evtx, .log, .mdb, etc) need to be placed within the _input d
 
 		# Search
 		elif choice == '18':
-			search_freesearch()
+			search_columns()
 		elif choice == '19':
-			search_ipv4()
+			search_freesearch()
 		elif choice == '20':
-			search_regex()
+			extract_iocs()
 		elif choice == '21':
+			search_ipv4()
+		elif choice == '22':
+			search_regex()
+		elif choice == '23':
 			search_wordlist()
+		elif choice == '24':
+			build_trigram_index()
 
 		# Triage
-		elif choice == '22':
+		elif choice == '25':
 			triage_hayabusa_winlogon()
-		elif choice == '23':
+		elif choice == '26':
 			triage_hayabusa_timeline()
 
 		else:
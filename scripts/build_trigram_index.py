@@ -0,0 +1,17 @@
+"""
+Builds (or refreshes) the trigram index of _input in tmp/trigram_index.sqlite.
+Once it exists, free-text, wordlist and regex searches only scan the blocks that can match.
+Re-running only re-indexes new or changed files.
+"""
+
+from common_paths import get_toolkit_dirs
+from common_index import get_index_path, refresh_index
+
+if __name__ == "__main__":
+    # Common_paths
+    dirs = get_toolkit_dirs()
+    default_input_directory = dirs['input_dir']
+
+    index_path = get_index_path()
+    print(f"Indexing {default_input_directory} into {index_path}...")
+    refresh_index(default_input_directory, index_path)
@@ -0,0 +1,183 @@
+import os
+import time
+import gzip
+import json
+import hashlib
+
+from common_paths import get_toolkit_dirs
+from common_scan import split_source
+
+# Bump when the row layout of any tool changes, so old entries are not served
+CACHE_VERSION = 2
+
+CACHE_DIR_NAME = 'scan_cache'
+
+# Cached rows are read back in batches of this size
+CACHE_READ_ROWS = 10000
+
+# Least recently used entries are pruned beyond this total size, and unused entries after this age
+CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+CACHE_MAX_AGE_DAYS = 30
+
+def get_cache_dir():
+    """
+    Returns the location of the per-file result cache, tmp/scan_cache.
+    """
+    return os.path.join(get_toolkit_dirs()['tmp_dir'], CACHE_DIR_NAME)
+
+def hash_params(params):
+    """
+    Returns a short stable hash of a tool's parameters (wordlist, regex set, flags, ...).
+    """
+    encoded = json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+def file_fingerprint(file_path, content_hash=False):
+    """
+    Returns the fingerprint of a file: path, size and modification time, plus the SHA-256 of the
+    content if content_hash is set. Zip members ('<archive>!<member>') take those of the archive.
+    """
+    disk_path, _ = split_source(file_path)
+    stat = os.stat(disk_path)
+    fingerprint = {
+        'path': os.path.abspath(file_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+    if content_hash:
+        digest = hashlib.sha256()
+        with open(disk_path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(block)
+        fingerprint['sha256'] = digest.hexdigest()
+    return fingerprint
+
+def prompt_cache_mode():
+    """
+    Asks whether to cache results per file for re-runs, and how to detect changed files.
+    Returns None to run without the cache, else whether fingerprints include a content hash.
+    """
+    while True:
+        cache_input = input("Cache results for faster re-runs (Y/N, Enter for N): ").strip().lower() or 'n'
+        if cache_input in {'y', 'n'}:
+            break
+        print("Invalid input. Please enter 'Y' for yes or 'N' for no.")
+    if cache_input == 'n':
+        return None
+    while True:
+        hash_input = input("Detect changed files by content hash, slower (Y/N, Enter for N): ").strip().lower() or 'n'
+        if hash_input in {'y', 'n'}:
+            return hash_input == 'y'
+        print("Invalid input. Please enter 'Y' for yes or 'N' for no.")
+
+def prune_cache(cache_dir=None, max_bytes=CACHE_MAX_BYTES, max_age_days=CACHE_MAX_AGE_DAYS):
+    """
+    Deletes cache entries not used for max_age_days, then the least recently used ones until the
+    cache holds at most max_bytes, and finally empty tool directories. Entries are marked as
+    used by their modification time, which lookup() refreshes on every hit.
+    """
+    cache_dir = cache_dir or get_cache_dir()
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for root, _, files in os.walk(cache_dir):
+        for file_name in files:
+            if file_name.endswith('.jsonl.gz'):
+                entry_path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(entry_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry_path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    expired = time.time() - max_age_days * 24 * 3600
+    for mtime, size, entry_path in entries:
+        if mtime >= expired and total <= max_bytes:
+            break
+        try:
+            os.remove(entry_path)
+        except OSError:
+            continue
+        total -= size
+    for name in os.listdir(cache_dir):
+        tool_dir = os.path.join(cache_dir, name)
+        if os.path.isdir(tool_dir) and not os.listdir(tool_dir):
+            os.rmdir(tool_dir)
+
+class _CacheWriter:
+    def __init__(self, entry_path, fingerprint):
+        self._entry_path = entry_path
+        self._tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        self._file = gzip.open(self._tmp_path, 'wt', encoding='utf-8')
+        self._file.write(json.dumps(fingerprint) + '\n')
+
+    def write_rows(self, rows):
+        self._file.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+
+    def commit(self):
+        self._file.close()
+        os.replace(self._tmp_path, self._entry_path)
+
+    def discard(self):
+        self._file.close()
+        os.remove(self._tmp_path)
+
+class ResultCache:
+    """
+    Per-file result cache for one tool and one set of parameters, stored under tmp/scan_cache.
+    An entry is only served while the file's fingerprint (path, size, mtime and optionally a
+    content hash) is unchanged, so re-runs only scan new or changed files.
+    The whole cache is pruned (see prune_cache) whenever a ResultCache is created.
+    """
+
+    def __init__(self, tool, params, cache_dir=None, content_hash=False):
+        self.content_hash = content_hash
+        key = hash_params([CACHE_VERSION, tool, params])
+        cache_dir = cache_dir or get_cache_dir()
+        prune_cache(cache_dir)
+        self.cache_dir = os.path.join(cache_dir, f"{tool}_{key[:16]}")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, file_path):
+        name = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.jsonl.gz")
+
+    def fingerprint(self, file_path):
+        return file_fingerprint(file_path, self.content_hash)
+
+    def lookup(self, file_path, fingerprint):
+        """
+        Returns the cache entry for file_path if it was stored for the same fingerprint, else None.
+        """
+        entry_path = self._entry_path(file_path)
+        try:
+            with gzip.open(entry_path, 'rt', encoding='utf-8') as file:
+                if json.loads(file.readline()) == fingerprint:
+                    # Marks the entry as recently used for prune_cache
+                    os.utime(entry_path)
+                    return entry_path
+        except (OSError, ValueError, EOFError):
+            pass
+        return None
+
+    def iter_rows(self, entry_path):
+        """
+        Yields the cached rows of an entry in batches.
+        """
+        with gzip.open(entry_path, 'rt', encoding='utf-8') as file:
+            file.readline()
+            batch = []
+            for line in file:
+                batch.append(json.loads(line))
+                if len(batch) >= CACHE_READ_ROWS:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def writer(self, file_path, fingerprint):
+        """
+        Returns a writer for the rows of file_path; the entry only replaces the old one on commit().
+        """
+        return _CacheWriter(self._entry_path(file_path), fingerprint)
@@ -0,0 +1,296 @@
+import os
+import sqlite3
+import numpy as np
+
+from common_paths import get_toolkit_dirs
+from common_scan import (
+    DEFAULT_CHUNK_SIZE, SPLITTABLE_ENCODINGS, iter_input_files, iter_input_sources, split_file_ranges,
+    plan_file_ranges, sniff_encoding, is_plain_file
+)
+
+# Files are indexed in newline-aligned blocks of about this size; a query scans candidate blocks only
+INDEX_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Postings keep one bitmask per (trigram, file, segment), one bit per block of the segment
+SEGMENT_BLOCKS = 32
+
+INDEX_FILE_NAME = 'trigram_index.sqlite'
+
+def get_index_path():
+    """
+    Returns the location of the trigram index, tmp/trigram_index.sqlite.
+    """
+    return os.path.join(get_toolkit_dirs()['tmp_dir'], INDEX_FILE_NAME)
+
+def open_index(index_path):
+    connection = sqlite3.connect(index_path)
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS files (
+            file_id INTEGER PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS blocks (
+            file_id INTEGER NOT NULL,
+            block_no INTEGER NOT NULL,
+            start INTEGER NOT NULL,
+            end INTEGER NOT NULL,
+            first_line INTEGER NOT NULL,
+            PRIMARY KEY (file_id, block_no)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS postings (
+            trigram INTEGER NOT NULL,
+            file_id INTEGER NOT NULL,
+            segment INTEGER NOT NULL,
+            mask INTEGER NOT NULL,
+            PRIMARY KEY (trigram, file_id, segment)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id);
+    """)
+    return connection
+
+def _delete_file(connection, file_id):
+    connection.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+    connection.execute("DELETE FROM blocks WHERE file_id = ?", (file_id,))
+    connection.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+
+# Reused bitmask per possible trigram (24 bits) while a multi-block file is indexed
+_segment_masks = None
+
+def _block_trigrams(data):
+    values = np.frombuffer(data.lower(), dtype=np.uint8).astype(np.uint32)
+    return (values[:-2] << 16) | (values[1:-1] << 8) | values[2:]
+
+def _insert_postings(connection, file_id, segment, trigrams, masks):
+    connection.executemany(
+        "INSERT INTO postings (trigram, file_id, segment, mask) VALUES (?, ?, ?, ?)",
+        zip(trigrams.tolist(), [file_id] * trigrams.size, [segment] * trigrams.size, masks)
+    )
+
+def _index_file(connection, file_path, stat):
+    """
+    Reads a file block by block and stores its blocks and trigram postings.
+    Trigrams are taken from the ASCII-lower-cased bytes, so lookups are case-insensitive.
+    """
+    global _segment_masks
+
+    cursor = connection.execute(
+        "INSERT INTO files (path, size, mtime_ns) VALUES (?, ?, ?)",
+        (file_path, stat.st_size, stat.st_mtime_ns)
+    )
+    file_id = cursor.lastrowid
+    ranges = split_file_ranges(file_path, INDEX_BLOCK_SIZE)
+
+    with open(file_path, 'rb') as file:
+        if len(ranges) == 1:
+            # Small file: a single block, so the distinct trigrams are all that is needed
+            start, end = ranges[0]
+            data = file.read(end - start)
+            connection.execute(
+                "INSERT INTO blocks (file_id, block_no, start, end, first_line) VALUES (?, 0, ?, ?, 1)",
+                (file_id, start, end)
+            )
+            if len(data) >= 3:
+                trigrams = np.unique(_block_trigrams(data))
+                _insert_postings(connection, file_id, 0, trigrams, [1] * trigrams.size)
+            return
+
+        if _segment_masks is None:
+            _segment_masks = np.zeros(1 << 24, dtype=np.uint32)
+        masks = _segment_masks
+
+        def flush_segment(segment):
+            trigrams = np.flatnonzero(masks)
+            if trigrams.size:
+                _insert_postings(connection, file_id, segment, trigrams, masks[trigrams].tolist())
+                masks[trigrams] = 0
+
+        first_line = 1
+        segment = 0
+        try:
+            for block_no, (start, end) in enumerate(ranges):
+                if block_no // SEGMENT_BLOCKS != segment:
+                    flush_segment(segment)
+                    segment = block_no // SEGMENT_BLOCKS
+
+                file.seek(start)
+                data = file.read(end - start)
+                connection.execute(
+                    "INSERT INTO blocks (file_id, block_no, start, end, first_line) VALUES (?, ?, ?, ?, ?)",
+                    (file_id, block_no, start, end, first_line)
+                )
+                first_line += data.count(b'\n')
+                if len(data) >= 3:
+                    masks[_block_trigrams(data)] |= np.uint32(1 << (block_no % SEGMENT_BLOCKS))
+            flush_segment(segment)
+        except BaseException:
+            masks[:] = 0
+            raise
+
+def refresh_index(path, index_path=None):
+    """
+    Brings the index up to date with the files under `path`: new files are indexed, changed files
+    (size or modification time differ) are re-indexed, and files that disappeared are dropped.
+    Unchanged files are left alone.
+    """
+    index_path = index_path or get_index_path()
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    connection = open_index(index_path)
+    try:
+        indexed = {
+            row[0]: row[1:]
+            for row in connection.execute("SELECT path, file_id, size, mtime_ns FROM files")
+        }
+        prefix = os.path.join(os.path.abspath(path), '')
+        seen = set()
+        added = updated = removed = 0
+
+        for file_path in iter_input_files(path):
+            file_path = os.path.abspath(file_path)
+            stat = os.stat(file_path)
+            entry = indexed.get(file_path)
+            if entry and entry[1] == stat.st_size and entry[2] == stat.st_mtime_ns:
+                seen.add(file_path)
+                continue
+            # Binary, UTF-16 and compressed files are left out; searches scan (or skip) them in full
+            try:
+                if not is_plain_file(file_path) or sniff_encoding(file_path) not in SPLITTABLE_ENCODINGS:
+                    continue
+            except OSError as e:
+                print(f"An error occurred while opening {file_path}: {e}")
+                continue
+            seen.add(file_path)
+
+            print(f"Indexing file: {file_path}")
+            try:
+                if entry:
+                    _delete_file(connection, entry[0])
+                _index_file(connection, file_path, stat)
+                connection.commit()
+            except Exception as e:
+                connection.rollback()
+                print(f"An error occurred while indexing {file_path}: {e}")
+                continue
+            if entry:
+                updated += 1
+            else:
+                added += 1
+
+        for file_path, entry in indexed.items():
+            if (file_path.startswith(prefix) or file_path == os.path.abspath(path)) and file_path not in seen:
+                _delete_file(connection, entry[0])
+                removed += 1
+        connection.commit()
+        print(f"Index up to date: {added} added, {updated} re-indexed, {removed} removed.")
+    finally:
+        connection.close()
+
+def literal_trigrams(text):
+    """
+    Returns the trigrams (as 24-bit integers) of a literal, lower-cased like the index.
+    Trigrams with non-ASCII bytes are left out, as bytes.lower() does not fold them.
+    """
+    data = text.encode('utf-8').lower()
+    return {
+        (data[i] << 16) | (data[i + 1] << 8) | data[i + 2]
+        for i in range(len(data) - 2)
+        if data[i] < 128 and data[i + 1] < 128 and data[i + 2] < 128
+    }
+
+def _candidate_masks(connection, trigrams):
+    """
+    Returns {(file_id, segment): mask} of the blocks containing every trigram in `trigrams`.
+    """
+    candidates = None
+    for trigram in trigrams:
+        rows = connection.execute(
+            "SELECT file_id, segment, mask FROM postings WHERE trigram = ?", (trigram,)
+        )
+        if candidates is None:
+            candidates = {(file_id, segment): mask for file_id, segment, mask in rows}
+        else:
+            found = {(file_id, segment): mask for file_id, segment, mask in rows}
+            candidates = {
+                key: mask & found[key]
+                for key, mask in candidates.items()
+                if key in found and mask & found[key]
+            }
+        if not candidates:
+            break
+    return candidates or {}
+
+def plan_indexed_ranges(path, alternatives, index_path=None):
+    """
+    Uses the trigram index to plan which parts of the files under `path` need scanning.
+    `alternatives` is a list of literal lists: a block is a candidate if, for any alternative,
+    it contains every literal of that alternative.
+
+    Returns a list of (file_path, start, end, first_line) tasks for scan_input(), or None when
+    there is no index or some alternative has no usable trigram (the caller then scans everything).
+    """
+    index_path = index_path or get_index_path()
+    if not os.path.isfile(index_path):
+        return None
+
+    alternative_trigrams = []
+    for literals in alternatives:
+        trigrams = set()
+        for literal in literals:
+            trigrams |= literal_trigrams(literal)
+        if not trigrams:
+            return None
+        alternative_trigrams.append(trigrams)
+
+    refresh_index(path, index_path)
+
+    connection = open_index(index_path)
+    try:
+        # {file_id: {segment: mask}} of candidate blocks
+        masks = {}
+        for trigrams in alternative_trigrams:
+            for (file_id, segment), mask in _candidate_masks(connection, trigrams).items():
+                file_masks = masks.setdefault(file_id, {})
+                file_masks[segment] = file_masks.get(segment, 0) | mask
+
+        indexed = {
+            row[0]: row[1:] for row in connection.execute("SELECT path, file_id, size, mtime_ns FROM files")
+        }
+        tasks = []
+        for file_path in iter_input_sources(path):
+            entry = indexed.get(os.path.abspath(file_path))
+            stat = os.stat(file_path) if entry else None
+            if entry is None or entry[1] != stat.st_size or entry[2] != stat.st_mtime_ns:
+                # Could not be indexed, so it has to be scanned in full
+                tasks.extend((file_path, start, end, None) for start, end in plan_file_ranges(file_path))
+                continue
+            file_id = entry[0]
+
+            if file_id not in masks:
+                continue
+            block_numbers = [
+                segment * SEGMENT_BLOCKS + bit
+                for segment, mask in sorted(masks[file_id].items())
+                for bit in range(SEGMENT_BLOCKS)
+                if mask >> bit & 1
+            ]
+
+            blocks = {
+                row[0]: row[1:]
+                for row in connection.execute(
+                    "SELECT block_no, start, end, first_line FROM blocks WHERE file_id = ?", (file_id,)
+                )
+            }
+            # Neighbouring candidate blocks are merged into ranges of up to DEFAULT_CHUNK_SIZE
+            previous = None
+            for block_no in block_numbers:
+                start, end, first_line = blocks[block_no]
+                if (previous == block_no - 1 and tasks[-1][2] == start
+                        and end - tasks[-1][1] <= DEFAULT_CHUNK_SIZE):
+                    tasks[-1] = (file_path, tasks[-1][1], end, tasks[-1][3])
+                else:
+                    tasks.append((file_path, start, end, first_line))
+                previous = block_no
+        return tasks
+    finally:
+        connection.close()
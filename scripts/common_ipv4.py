@@ -0,0 +1,110 @@
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from ipaddress import ip_address, ip_network
+
+# Only well-formed dotted quads (each octet 0-255, no leading zeros), so every hit converts cleanly
+_OCTET = r'(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])'
+IPV4_PATTERN = re.compile(rf'\b{_OCTET}\.{_OCTET}\.{_OCTET}\.{_OCTET}\b')
+
+# Logs repeat the same addresses over and over, so classifications are cached per address
+CLASSIFY_CACHE_SIZE = 1 << 16
+
+def ipv4_to_int(address):
+    """
+    Converts a dotted-quad string already matched by IPV4_PATTERN to an integer.
+    """
+    a, b, c, d = address.split('.')
+    return (int(a) << 24) | (int(b) << 16) | (int(c) << 8) | int(d)
+
+def int_to_ipv4(value):
+    return f"{value >> 24 & 255}.{value >> 16 & 255}.{value >> 8 & 255}.{value & 255}"
+
+@lru_cache(maxsize=CLASSIFY_CACHE_SIZE)
+def is_private_ipv4(address):
+    """
+    Returns ipaddress' is_private for a dotted-quad string, computed once per distinct address.
+    """
+    return ip_address(address).is_private
+
+class CidrWatchlist:
+    """
+    A set of IPv4 CIDR ranges flattened into sorted, non-overlapping intervals.
+    lookup(address) finds the most specific range containing an address with one bisect,
+    so the cost is O(log n) however large the watchlist is.
+    """
+
+    def __init__(self, cidrs):
+        networks = set()
+        for cidr in cidrs:
+            network = ip_network(cidr, strict=False)
+            if network.version == 4:
+                networks.add(network)
+        self.cidrs = sorted(str(network) for network in networks)
+
+        # Outer ranges sort before the ranges nested in them
+        ranges = sorted(
+            ((int(network.network_address), int(network.broadcast_address), str(network))
+             for network in networks),
+            key=lambda item: (item[0], -item[1])
+        )
+
+        self._starts = []
+        self._ends = []
+        self._labels = []
+        open_ranges = []
+        position = 0
+        for start, end, label in ranges:
+            while open_ranges and open_ranges[-1][0] < start:
+                position = self._close(open_ranges.pop(), position)
+            if open_ranges:
+                self._emit(position, start - 1, open_ranges[-1][1])
+            open_ranges.append((end, label))
+            position = start
+        while open_ranges:
+            position = self._close(open_ranges.pop(), position)
+
+    def _emit(self, start, end, label):
+        if start <= end:
+            self._starts.append(start)
+            self._ends.append(end)
+            self._labels.append(label)
+
+    def _close(self, open_range, position):
+        end, label = open_range
+        self._emit(position, end, label)
+        return max(position, end + 1)
+
+    def __len__(self):
+        return len(self.cidrs)
+
+    def lookup_int(self, value):
+        index = bisect_right(self._starts, value) - 1
+        if index >= 0 and value <= self._ends[index]:
+            return self._labels[index]
+        return None
+
+    def lookup(self, address):
+        """
+        Returns the most specific watchlist CIDR containing a dotted-quad address, or None.
+        """
+        return self.lookup_int(ipv4_to_int(address))
+
+def load_cidr_watchlist(file_path):
+    """
+    Reads a watchlist file with one IPv4 address or CIDR range per line; '#' starts a comment.
+    Invalid entries are reported and skipped.
+    """
+    cidrs = []
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, start=1):
+            entry = line.split('#', 1)[0].strip()
+            if not entry:
+                continue
+            try:
+                ip_network(entry, strict=False)
+            except ValueError:
+                print(f"Skipping invalid watchlist entry on line {line_number}: {entry}")
+                continue
+            cidrs.append(entry)
+    return CidrWatchlist(cidrs)
@@ -0,0 +1,292 @@
+import re
+import multiprocessing
+
+import regex
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+def _build_trie_pattern(words):
+    """
+    Builds a regex that behaves like a trie over `words`, so the C regex engine
+    can reject non-matching text without trying every word at every position.
+    Only used as a prefilter: it stops at the shortest word on each branch.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        if '' in node:
+            return ''
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items())]
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')'
+
+    if not trie:
+        return None
+    return build(trie)
+
+class WordlistMatcher:
+    """
+    Case-insensitive multi-term matcher (Aho-Corasick automaton) built once from a wordlist.
+    match(line) returns every term found in the line, in wordlist order.
+    """
+
+    def __init__(self, terms):
+        self.terms = list(terms)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        # Trie of lower-cased terms; each node keeps the indices of the terms ending there
+        lowered_terms = []
+        for index, term in enumerate(self.terms):
+            lowered = term.lower()
+            if not lowered:
+                continue
+            lowered_terms.append(lowered)
+            state = 0
+            for char in lowered:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append(index)
+
+        # Breadth-first pass to set failure links and merge outputs along them
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+                queue.append(next_state)
+
+        trie_pattern = _build_trie_pattern(lowered_terms)
+        self._prefilter = re.compile(trie_pattern) if trie_pattern is not None else None
+
+    def match(self, line):
+        """
+        Returns the list of terms (as given in the wordlist) that occur in `line`.
+        """
+        if self._prefilter is None:
+            return []
+        lowered = line.lower()
+        first_hit = self._prefilter.search(lowered)
+        if first_hit is None:
+            return []
+
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for char in lowered[first_hit.start():]:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return [self.terms[index] for index in sorted(found)]
+
+# Backreferences are numbered/named per pattern, so such patterns cannot join the combined prefilter
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+# Leading global flags such as (?i) are only valid at the start of the whole combined regex
+_LEADING_FLAGS = re.compile(r'^\(\?([ims]+)\)')
+
+def _scoped(pattern):
+    """
+    Wraps a pattern for use inside an alternation, turning leading global flags into scoped ones.
+    """
+    flags = _LEADING_FLAGS.match(pattern)
+    if flags:
+        return f'(?{flags.group(1)}:{pattern[flags.end():]})'
+    return f'(?:{pattern})'
+
+# A risky pattern whose search on one line takes longer than this is aborted and quarantined
+DEFAULT_LINE_BUDGET = 0.1
+
+class RegexScanner:
+    """
+    Compiles a set of {regex_pattern: pattern_description} once into a single scanner.
+
+    Patterns with required literal substrings (see required_literals) are only run on lines
+    containing all of them: the longest literal of every pattern goes into one Aho-Corasick
+    matcher, so a single pass over the line finds the candidate patterns. Patterns without
+    literals share a combined alternation that rejects most lines in one regex call.
+
+    Patterns prone to catastrophic backtracking are listed in `risky`. They run on the `regex`
+    engine, whose searches are aborted after line_budget seconds; a pattern that runs out of time
+    is quarantined and skipped for the rest of the run. The quarantine flags live in shared
+    memory, so a pattern quarantined in one worker process is skipped by all of them.
+    `skipped` counts the candidate lines a quarantined pattern was not run on, in this process.
+    """
+
+    def __init__(self, regex_patterns, line_budget=DEFAULT_LINE_BUDGET):
+        self.patterns = []
+        self.line_budget = line_budget
+        self.risky = {}
+        self.skipped = 0
+        self._timed = set()
+        self._literals = []
+        self._anchored = {}
+        self._unconditional = []
+        combinable = []
+        for pattern, description in regex_patterns.items():
+            index = len(self.patterns)
+            self.patterns.append((pattern, description, re.compile(pattern)))
+            self._literals.append([])
+
+            risk = backtracking_risk(pattern)
+            if risk:
+                self.risky[pattern] = risk
+                try:
+                    # Unlike re, the regex engine can abort a search after a timeout
+                    self.patterns[index] = (pattern, description, regex.compile(pattern))
+                    self._timed.add(index)
+                except regex.error:
+                    pass
+            literals = [literal.lower() for literal in required_literals(pattern) if literal]
+            if literals:
+                self._literals[index] = literals
+                self._anchored.setdefault(max(literals, key=len), []).append(index)
+            elif _BACKREFERENCE.search(pattern) or risk:
+                # Kept out of the combined prefilter, which would otherwise inherit its cost
+                self._unconditional.append(index)
+            else:
+                combinable.append(index)
+
+        self._anchors = WordlistMatcher(self._anchored) if self._anchored else None
+        self._combined = combinable
+        self._prefilter = None
+        if combinable:
+            try:
+                self._prefilter = re.compile('|'.join(_scoped(self.patterns[index][0]) for index in combinable))
+            except re.error:
+                # e.g. the same group name used by two patterns; confirm them on every line
+                self._unconditional.extend(combinable)
+                self._combined = []
+        # One flag per pattern, inherited by the worker processes
+        self._quarantine = multiprocessing.Array('b', len(self.patterns), lock=False)
+
+    @property
+    def quarantined(self):
+        """
+        Returns the indices of the patterns quarantined so far by any process.
+        """
+        return [index for index in self._timed if self._quarantine[index]]
+
+    def candidates(self, line):
+        """
+        Returns the indices of the patterns that can match `line`, in pattern order.
+        """
+        candidates = list(self._unconditional)
+        if self._anchors is not None:
+            anchors = self._anchors.match(line)
+            if anchors:
+                lowered = line.lower()
+                for anchor in anchors:
+                    for index in self._anchored[anchor]:
+                        if all(literal in lowered for literal in self._literals[index]):
+                            candidates.append(index)
+        if self._prefilter is not None and self._prefilter.search(line):
+            candidates.extend(self._combined)
+        return sorted(candidates)
+
+    def match(self, line):
+        """
+        Returns the list of (regex_pattern, pattern_description) pairs matching `line`.
+        """
+        matches = []
+        for index in self.candidates(line):
+            pattern, description, compiled = self.patterns[index]
+            if index in self._timed:
+                if self._quarantine[index]:
+                    self.skipped += 1
+                    continue
+                try:
+                    found = compiled.search(line, timeout=self.line_budget)
+                except TimeoutError:
+                    self._quarantine[index] = 1
+                    self.skipped += 1
+                    print(f"Pattern ran out of its {self.line_budget}s budget on one line "
+                          f"and is skipped from now on: {pattern}")
+                    continue
+            else:
+                found = compiled.search(line)
+            if found:
+                matches.append((pattern, description))
+        return matches
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+if hasattr(sre_constants, 'POSSESSIVE_REPEAT'):
+    _REPEATS.add(sre_constants.POSSESSIVE_REPEAT)
+
+def _collect_literals(parsed, literals):
+    run = []
+    for op, value in parsed:
+        if op is sre_constants.LITERAL:
+            run.append(chr(value))
+            continue
+        if run:
+            literals.append(''.join(run))
+            run = []
+        if op is sre_constants.SUBPATTERN:
+            _collect_literals(value[-1], literals)
+        elif op in _REPEATS and value[0] >= 1:
+            _collect_literals(value[2], literals)
+    if run:
+        literals.append(''.join(run))
+
+def required_literals(pattern):
+    """
+    Returns literal substrings that every match of `pattern` must contain, e.g.
+    r'cmd\.exe /c (\w+) -enc' -> ['cmd.exe /c ', ' -enc'].
+    Alternations and optional parts contribute nothing, so the list can be empty.
+    """
+    literals = []
+    _collect_literals(sre_parse.parse(pattern), literals)
+    return literals
+
+def _nested_unbounded(parsed, inside_unbounded):
+    for op, value in parsed:
+        if op in _REPEATS:
+            unbounded = value[1] == sre_constants.MAXREPEAT
+            if unbounded and inside_unbounded:
+                return True
+            if _nested_unbounded(value[2], inside_unbounded or unbounded):
+                return True
+        elif op is sre_constants.SUBPATTERN:
+            if _nested_unbounded(value[-1], inside_unbounded):
+                return True
+        elif op is sre_constants.BRANCH:
+            if any(_nested_unbounded(branch, inside_unbounded) for branch in value[1]):
+                return True
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            if _nested_unbounded(value[1], inside_unbounded):
+                return True
+    return False
+
+def backtracking_risk(pattern):
+    """
+    Returns why `pattern` is prone to catastrophic backtracking, or None.
+    Flags nested unbounded quantifiers such as (a+)+, (\\w*\\s?)* or (?:x|.+)*, which can take
+    exponential time on lines that almost match.
+    """
+    if _nested_unbounded(sre_parse.parse(pattern), False):
+        return 'nested unbounded quantifiers'
+    return None
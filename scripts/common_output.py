@@ -0,0 +1,290 @@
+import os
+import csv
+import json
+from datetime import datetime
+
+from common_timestamps import hour_buckets
+
+# Rows buffered in memory before they are written out
+DEFAULT_FLUSH_ROWS = 10000
+
+OUTPUT_FORMATS = {
+    'csv': '.csv',
+    'jsonl': '.jsonl',
+    'parquet': '.parquet',
+}
+
+def prompt_output_format():
+    """
+    Asks the user which output format to write. Defaults to CSV.
+    """
+    while True:
+        output_format = input("Output format (CSV/JSONL/Parquet, Enter for CSV): ").strip().lower() or 'csv'
+        if output_format in OUTPUT_FORMATS:
+            return output_format
+        print("Invalid input. Please enter 'CSV', 'JSONL' or 'Parquet'.")
+
+def prompt_summary_mode():
+    """
+    Asks whether to write aggregated counts instead of one row per match.
+    Returns None for full output, else the number of sample rows to keep per term.
+    """
+    while True:
+        summary_input = input("Summary mode, counts only (Y/N, Enter for N): ").strip().lower() or 'n'
+        if summary_input in {'y', 'n'}:
+            break
+        print("Invalid input. Please enter 'Y' for yes or 'N' for no.")
+    if summary_input == 'n':
+        return None
+    while True:
+        samples_input = input("Sample lines to keep per term (Enter for 0): ").strip() or '0'
+        if samples_input.isdigit():
+            return int(samples_input)
+        print("Invalid input. Please enter a number.")
+
+def build_output_path(output_dir, name, output_format='csv'):
+    """
+    Returns <output_dir>/<name><extension> for the chosen output format.
+    """
+    return os.path.join(output_dir, f"{name}{OUTPUT_FORMATS[output_format]}")
+
+class _CsvBackend:
+    def __init__(self, output_path, header):
+        self._file = open(output_path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(header)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+class _JsonlBackend:
+    def __init__(self, output_path, header):
+        self._file = open(output_path, 'w', encoding='utf-8')
+        self._header = header
+
+    def write(self, rows):
+        self._file.writelines(
+            json.dumps(dict(zip(self._header, row)), ensure_ascii=False, default=str) + '\n' for row in rows
+        )
+
+    def close(self):
+        self._file.close()
+
+class _ParquetBackend:
+    """
+    Writes Parquet. Without a schema the first batch decides the column types. A given schema
+    fixes them instead: string values for timestamp and date columns are cast with Arrow, and
+    dictionary columns are dictionary-encoded. With row_group_size, batches are gathered into
+    row groups of that many rows, so the min/max statistics cover useful ranges.
+    """
+
+    def __init__(self, output_path, header, schema=None, row_group_size=None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._pq = pq
+        self._output_path = output_path
+        self._header = header
+        self._row_group_size = row_group_size
+        self._pending = []
+        self._pending_rows = 0
+        self._writer = None
+        if schema is not None:
+            self._writer = pq.ParquetWriter(output_path, schema)
+
+    def _array(self, values, field_type):
+        pa = self._pa
+        if pa.types.is_timestamp(field_type) or pa.types.is_date(field_type):
+            # Text tools produce 'YYYY-MM-DD HH:MM:SS' strings; Arrow parses them in bulk
+            return pa.array(values).cast(field_type)
+        return pa.array(values, type=field_type)
+
+    def _write_table(self, table):
+        if not self._row_group_size:
+            self._writer.write_table(table)
+            return
+        self._pending.append(table)
+        self._pending_rows += table.num_rows
+        if self._pending_rows >= self._row_group_size:
+            self._flush_row_groups(final=False)
+
+    def _flush_row_groups(self, final):
+        if not self._pending:
+            return
+        table = self._pa.concat_tables(self._pending)
+        full_rows = table.num_rows if final else table.num_rows - table.num_rows % self._row_group_size
+        if full_rows:
+            self._writer.write_table(table.slice(0, full_rows), row_group_size=self._row_group_size)
+        rest = table.slice(full_rows)
+        self._pending = [rest] if rest.num_rows else []
+        self._pending_rows = rest.num_rows
+
+    def write(self, rows):
+        pa = self._pa
+        columns = list(zip(*rows))
+        if self._writer is None:
+            # The first batch decides the column types; all-null columns are stored as strings
+            arrays = []
+            for values in columns:
+                array = pa.array(values)
+                if pa.types.is_null(array.type):
+                    array = pa.array(values, type=pa.string())
+                arrays.append(array)
+            table = pa.Table.from_arrays(arrays, names=self._header)
+            self._writer = self._pq.ParquetWriter(self._output_path, table.schema)
+        else:
+            schema = self._writer.schema
+            arrays = [self._array(values, field.type) for values, field in zip(columns, schema)]
+            table = pa.Table.from_arrays(arrays, schema=schema)
+        self._write_table(table)
+
+    def close(self):
+        if self._writer is None:
+            pa = self._pa
+            schema = pa.schema([(name, pa.string()) for name in self._header])
+            self._writer = self._pq.ParquetWriter(self._output_path, schema)
+        if self._row_group_size:
+            self._flush_row_groups(final=True)
+        self._writer.close()
+
+_BACKENDS = {
+    'csv': _CsvBackend,
+    'jsonl': _JsonlBackend,
+    'parquet': _ParquetBackend,
+}
+
+class ResultSink:
+    """
+    Single output handle for a whole run. Rows are buffered and written in batches of
+    `flush_rows`, instead of reopening the output file for every match.
+    The format is taken from `output_format`, or from the file extension if not given.
+
+    For Parquet, `schema` (a pyarrow schema over the header) fixes the column types and
+    `row_group_size` the rows per row group; both are ignored by the text formats.
+    """
+
+    def __init__(self, output_path, header, output_format=None, flush_rows=DEFAULT_FLUSH_ROWS,
+                 schema=None, row_group_size=None):
+        if output_format is None:
+            extension = os.path.splitext(output_path)[1].lower()
+            output_format = next(
+                (name for name, ext in OUTPUT_FORMATS.items() if ext == extension), 'csv'
+            )
+        self.output_path = output_path
+        self.header = list(header)
+        self.flush_rows = max(1, flush_rows)
+        self.row_count = 0
+        self._buffer = []
+        if output_format == 'parquet':
+            self._backend = _ParquetBackend(output_path, self.header, schema, row_group_size)
+        else:
+            self._backend = _BACKENDS[output_format](output_path, self.header)
+
+    def write_row(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.flush_rows:
+            self.flush()
+
+    def write_rows(self, rows):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._backend.write(self._buffer)
+            self.row_count += len(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        self.flush()
+        self._backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# Bucket for matching lines without a recognisable timestamp
+NO_TIMESTAMP = 'unknown'
+
+class SummarySink:
+    """
+    Count-only replacement for ResultSink. Instead of one row per match it keeps counters per
+    (term, file) and per (term, hour of the line's timestamp), and on close writes them to
+    <name>_by_file and <name>_by_hour. With `samples`, the first N full rows per term are also
+    written to <name>_samples with the normal header.
+    The columns of `header` holding the term, file, line number and line text are given by index.
+    """
+
+    def __init__(self, output_path, header, term_column, file_column, line_column, data_column,
+                 samples=0, output_format=None):
+        base, extension = os.path.splitext(output_path)
+        self.output_format = output_format
+        self.header = list(header)
+        self.by_file_path = f"{base}_by_file{extension}"
+        self.by_hour_path = f"{base}_by_hour{extension}"
+        self.row_count = 0
+        self._columns = (term_column, file_column, line_column, data_column)
+        self._samples = samples
+        self._sample_counts = {}
+        self._sample_sink = ResultSink(f"{base}_samples{extension}", header, output_format) if samples else None
+        # (term, file) -> [count, first_row_number, last_row_number]; (term, hour) -> count
+        self._by_file = {}
+        self._by_hour = {}
+        self._default_year = datetime.now().year
+
+    def write_row(self, row):
+        self.write_rows([row])
+
+    def write_rows(self, rows):
+        term_column, file_column, line_column, data_column = self._columns
+        # Timestamps are resolved once per distinct line of the batch; terms matching the same
+        # line share its bucket
+        lines = list(dict.fromkeys(row[data_column] for row in rows))
+        buckets = dict(zip(lines, hour_buckets(lines, self._default_year)))
+        for row in rows:
+            term = row[term_column]
+            line_number = row[line_column]
+            file_entry = self._by_file.get((term, row[file_column]))
+            if file_entry is None:
+                self._by_file[(term, row[file_column])] = [1, line_number, line_number]
+            else:
+                file_entry[0] += 1
+                file_entry[2] = line_number
+
+            key = (term, buckets[row[data_column]] or NO_TIMESTAMP)
+            self._by_hour[key] = self._by_hour.get(key, 0) + 1
+
+            if self._sample_sink and self._sample_counts.get(term, 0) < self._samples:
+                self._sample_counts[term] = self._sample_counts.get(term, 0) + 1
+                self._sample_sink.write_row(row)
+        self.row_count += len(rows)
+
+    def flush(self):
+        if self._sample_sink:
+            self._sample_sink.flush()
+
+    def close(self):
+        term_name = self.header[self._columns[0]]
+        with ResultSink(self.by_file_path, [
+            term_name, 'source_file', 'count', 'first_row_number', 'last_row_number'
+        ], self.output_format) as sink:
+            sink.write_rows([[term, file_path, *entry] for (term, file_path), entry in self._by_file.items()])
+        with ResultSink(self.by_hour_path, [term_name, 'hour_bucket', 'count'], self.output_format) as sink:
+            sink.write_rows([
+                [term, bucket, count] for (term, bucket), count in sorted(self._by_hour.items())
+            ])
+        if self._sample_sink:
+            self._sample_sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
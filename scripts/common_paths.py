@@ -8,6 +8,7 @@ def get_toolkit_dirs():
         'base_dir': base_dir,
         'input_dir': os.path.join(base_dir, '_input'),
         'output_dir': os.path.join(base_dir, '_output'),
+        'tmp_dir': os.path.join(base_dir, 'tmp'),
     }
 
     return dirs
@@ -0,0 +1,418 @@
+import os
+import re
+import bz2
+import gzip
+import lzma
+import codecs
+import zipfile
+import multiprocessing
+
+# One worker per core by default
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Files larger than this are split into newline-aligned byte ranges that are scanned concurrently
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024
+
+def iter_input_files(path):
+    """
+    Yields every file under `path` (which can be a file or directory).
+    """
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for file_name in files:
+                yield os.path.join(root, file_name)
+    elif os.path.isfile(path):
+        yield path
+    else:
+        print("Invalid path provided.")
+
+# Zip members are addressed as '<archive>!<member>'
+ARCHIVE_SEPARATOR = '!'
+
+# Single-stream compression formats that are decompressed on the fly
+# bz2 is 'BZh', the block size digit and the magic of the first block (pi), or of the end of
+# stream (sqrt(pi)) for an empty stream, so text starting with "BZh" is not mistaken for it
+_COMPRESSION_MAGIC = [
+    (re.compile(rb'\x1f\x8b'), 'gzip'),
+    (re.compile(rb'BZh[1-9](?:\x31\x41\x59\x26\x53\x59|\x17\x72\x45\x38\x50\x90)'), 'bz2'),
+    (re.compile(rb'\xfd7zXZ\x00'), 'xz'),
+]
+
+_DECOMPRESSORS = {
+    'gzip': gzip.open,
+    'bz2': bz2.open,
+    'xz': lzma.open,
+}
+
+def sniff_compression(file_path):
+    """
+    Returns 'gzip', 'bz2' or 'xz' if the file starts with the magic bytes of that format, else None.
+    """
+    with open(file_path, 'rb') as file:
+        head = file.read(10)
+    for magic, compression in _COMPRESSION_MAGIC:
+        if magic.match(head):
+            return compression
+    return None
+
+def is_zip_archive(file_path):
+    return file_path.lower().endswith('.zip') and zipfile.is_zipfile(file_path)
+
+def iter_input_sources(path):
+    """
+    Yields every scannable source under `path`: plain and compressed files by path, and each
+    member of a .zip archive as '<archive>!<member>'.
+    """
+    for file_path in iter_input_files(path):
+        if not is_zip_archive(file_path):
+            yield file_path
+            continue
+        try:
+            with zipfile.ZipFile(file_path) as archive:
+                members = [info.filename for info in archive.infolist() if not info.is_dir()]
+        except (OSError, zipfile.BadZipFile) as e:
+            print(f"An error occurred while opening {file_path}: {e}")
+            continue
+        for member in members:
+            yield f"{file_path}{ARCHIVE_SEPARATOR}{member}"
+
+def split_source(source):
+    """
+    Splits a source into (file_path, member); member is None unless the source is a zip member.
+    """
+    if os.path.isfile(source):
+        return source, None
+    index = source.find(ARCHIVE_SEPARATOR)
+    while index != -1:
+        if os.path.isfile(source[:index]):
+            return source[:index], source[index + 1:]
+        index = source.find(ARCHIVE_SEPARATOR, index + 1)
+    return source, None
+
+def is_plain_file(source):
+    """
+    True if the source is an uncompressed file on disk, so it can be seeked, split and mapped.
+    """
+    file_path, member = split_source(source)
+    return member is None and sniff_compression(file_path) is None
+
+def open_source(source):
+    """
+    Opens a source for binary reading, decompressing gzip/bz2/xz files and zip members as a stream.
+    """
+    file_path, member = split_source(source)
+    if member is not None:
+        with zipfile.ZipFile(file_path) as archive:
+            # The member keeps the archive file open until it is closed itself
+            return archive.open(member)
+    return _DECOMPRESSORS.get(sniff_compression(file_path), open)(file_path, 'rb')
+
+# Bytes read from the start of a file to decide how it is read
+SNIFF_SIZE = 4096
+
+# Files are decoded in blocks of this size when they cannot be read line by line as bytes
+DECODE_BLOCK_SIZE = 16 * 1024 * 1024
+
+_BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# Signatures of binary formats that turn up in collections; these are skipped without being read.
+# Compressed content inside a compressed source is recognised by _COMPRESSION_MAGIC.
+_BINARY_MAGIC = [
+    b'\x7fELF',
+    b'ElfFile\x00',               # Windows event logs (.evtx)
+    b'regf',                      # Registry hives
+    b'SQLite format 3\x00',
+    b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1',  # OLE (legacy Office, .msi)
+    b'%PDF-',
+    b'\x89PNG\r\n\x1a\n',
+    b'\xff\xd8\xff',               # JPEG
+    b'GIF8',
+    b'PK\x03\x04',                 # ZIP and Office Open XML
+    b'7z\xbc\xaf\x27\x1c',
+    b'Rar!\x1a\x07',
+    b'MSCF',                      # Cabinet
+    b'MAM\x04',                   # Compressed prefetch
+    b'SCCA',
+]
+
+def _is_pe(head):
+    """
+    True if `head` starts with an MZ header whose e_lfanew offset points at a 'PE\\0\\0' signature.
+    A bare 'MZ' prefix is not enough, as text files can start with it; PE headers beyond the
+    sniffed bytes are still caught by the NUL byte check.
+    """
+    if not head.startswith(b'MZ') or len(head) < 0x40:
+        return False
+    e_lfanew = int.from_bytes(head[0x3c:0x40], 'little')
+    return head[e_lfanew:e_lfanew + 4] == b'PE\x00\x00'
+
+# UTF-8 files (with or without BOM) can be split into byte ranges on b'\n'
+SPLITTABLE_ENCODINGS = {'utf-8', 'utf-8-sig'}
+
+def sniff_encoding(file_path):
+    """
+    Works out how to read a file from its first SNIFF_SIZE bytes.
+    Returns the codec name for text ('utf-8', 'utf-8-sig', 'utf-16', 'utf-16-le', 'utf-16-be'),
+    or None for binary files (known magic bytes, or NUL bytes that do not look like UTF-16).
+    Compressed sources are sniffed on their decompressed content.
+    """
+    with open_source(file_path) as file:
+        head = file.read(SNIFF_SIZE)
+
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    if any(head.startswith(magic) for magic in _BINARY_MAGIC) or _is_pe(head):
+        return None
+    if any(magic.match(head) for magic, _ in _COMPRESSION_MAGIC):
+        return None
+    if b'\x00' not in head:
+        return 'utf-8'
+
+    # UTF-16 without BOM: mostly-ASCII text has a NUL in every other byte
+    even_nuls = head[0::2].count(0)
+    odd_nuls = head[1::2].count(0)
+    half = len(head) // 2
+    if odd_nuls > half * 0.4 and even_nuls < half * 0.05:
+        return 'utf-16-le'
+    if even_nuls > half * 0.4 and odd_nuls < half * 0.05:
+        return 'utf-16-be'
+    return None
+
+def plan_file_ranges(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Returns the (start, end) byte ranges to scan a source in: newline-aligned chunks for plain
+    UTF-8 files, a single range for UTF-16 (decoded in bulk), one streamed (0, None) range for
+    compressed files and zip members, and none for binary files, which are skipped.
+    """
+    try:
+        encoding = sniff_encoding(file_path)
+        plain = is_plain_file(file_path)
+    except Exception as e:
+        print(f"An error occurred while opening {file_path}: {e}")
+        return []
+    if encoding is None:
+        print(f"Skipping binary file: {file_path}")
+        return []
+    if not plain:
+        return [(0, None)]
+    if encoding not in SPLITTABLE_ENCODINGS:
+        return [(0, os.path.getsize(file_path))]
+    return split_file_ranges(file_path, chunk_size)
+
+def split_file_ranges(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Splits a file into (start, end) byte ranges of roughly chunk_size bytes.
+    Every range except the last ends just after a newline, so no line is split across ranges.
+    """
+    size = os.path.getsize(file_path)
+    if size <= chunk_size:
+        return [(0, size)]
+
+    ranges = []
+    start = 0
+    with open(file_path, 'rb') as file:
+        while start < size:
+            file.seek(start + chunk_size)
+            file.readline()
+            end = min(file.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def iter_range_lines(file_path, start=0, end=None, encoding=None):
+    """
+    Yields the decoded lines of the byte range [start, end) of a source (end None reads to the end).
+    The encoding is sniffed when not given; undecodable bytes are replaced rather than raising.
+    UTF-16 files are decoded in large blocks and split on '\\n', so they must be read from start 0,
+    as must compressed files and zip members, which are decompressed as a stream.
+    """
+    if encoding is None:
+        encoding = sniff_encoding(file_path) or 'utf-8'
+    with open_source(file_path) as file:
+        if start:
+            file.seek(start)
+        # -1 reads to the end of the source
+        remaining = -1 if end is None else end - start
+
+        if encoding not in SPLITTABLE_ENCODINGS:
+            decoder = codecs.getincrementaldecoder(encoding)('replace')
+            pending = ''
+            while remaining:
+                block = file.read(DECODE_BLOCK_SIZE if remaining < 0 else min(remaining, DECODE_BLOCK_SIZE))
+                if not block:
+                    break
+                if remaining > 0:
+                    remaining -= len(block)
+                lines = (pending + decoder.decode(block)).split('\n')
+                pending = lines.pop()
+                for line in lines:
+                    yield line + '\n'
+            pending += decoder.decode(b'', final=True)
+            if pending:
+                yield pending
+            return
+
+        while remaining:
+            line = file.readline(remaining)
+            if not line:
+                break
+            if remaining > 0:
+                remaining -= len(line)
+            yield line.decode(encoding, 'replace')
+
+def count_range_lines(file_path, start=0, end=None):
+    """
+    Counts the lines of the byte range [start, end) of a file without decoding them.
+    Used to keep line numbers of later ranges exact when a range could not be scanned.
+    """
+    count = 0
+    last_byte = b'\n'
+    try:
+        with open_source(file_path) as file:
+            if start:
+                file.seek(start)
+            remaining = -1 if end is None else end - start
+            while remaining:
+                block = file.read(1024 * 1024 if remaining < 0 else min(remaining, 1024 * 1024))
+                if not block:
+                    break
+                if remaining > 0:
+                    remaining -= len(block)
+                count += block.count(b'\n')
+                last_byte = block[-1:]
+    except Exception:
+        pass
+    # A final line without a trailing newline still counts
+    return count + (last_byte != b'\n')
+
+# Set once per worker process by _init_worker, so large matchers are not re-sent with every task
+_scan_range = None
+_scan_args = ()
+
+def _init_worker(scan_range, scan_args):
+    global _scan_range, _scan_args
+    _scan_range = scan_range
+    _scan_args = scan_args
+
+def _scan_task(task):
+    file_path, start, end, first_line = task
+    rows, line_count, complete = _scan_range(file_path, *_scan_args, start=start, end=end)
+    return file_path, start, first_line, rows, line_count, complete
+
+def _group_by_file(tasks):
+    """
+    Groups consecutive tasks of the same file: [(file_path, [task, ...]), ...].
+    """
+    groups = []
+    for task in tasks:
+        if groups and groups[-1][0] == task[0]:
+            groups[-1][1].append(task)
+        else:
+            groups.append((task[0], [task]))
+    return groups
+
+def scan_input(path, scan_range, scan_args=(), sink=None, workers=DEFAULT_WORKERS,
+               line_column=1, chunk_size=DEFAULT_CHUNK_SIZE, tasks=None, cache=None):
+    """
+    Runs scan_range(file_path, *scan_args, start=start, end=end) over every file under `path`.
+    scan_range returns (rows, line_count, complete), numbering lines from 1 at `start`;
+    complete is False when the range could not be scanned in full (read error, truncated
+    archive, ...), in which case the rows found so far are still written.
+
+    Files larger than chunk_size are split into newline-aligned byte ranges, and all ranges are
+    fanned out across a pool of `workers` processes. This process is the single writer: rows come
+    back in file and range order, the line number in row[line_column] is shifted by the lines of
+    the preceding ranges of the same file, and the rows are written to sink (a ResultSink).
+    line_column can also be a tuple when rows carry several line numbers.
+    scan_range must be a module-level function so it can be sent to the workers.
+
+    `tasks` can replace the full walk with planned (file_path, start, end, first_line) ranges,
+    e.g. the candidate blocks from the trigram index; a known first_line sets the line offset.
+
+    With a `cache` (a ResultCache), files whose fingerprint is unchanged are served from the
+    cache instead of being scanned, and the rows of scanned files are stored for the next run.
+    Files with an incomplete range are not stored, so a failed scan is retried next time.
+    """
+    line_columns = (line_column,) if isinstance(line_column, int) else tuple(line_column)
+    if tasks is None:
+        tasks = [
+            (file_path, start, end, None)
+            for file_path in iter_input_sources(path)
+            for start, end in plan_file_ranges(file_path, chunk_size)
+        ]
+
+    # Decide per file whether it is served from the cache or scanned
+    plan = []
+    pending = []
+    for file_path, file_tasks in _group_by_file(tasks):
+        fingerprint = entry = None
+        if cache:
+            try:
+                fingerprint = cache.fingerprint(file_path)
+                entry = cache.lookup(file_path, fingerprint)
+            except OSError:
+                fingerprint = None
+        plan.append((file_path, file_tasks, fingerprint, entry))
+        if entry is None:
+            pending.extend(file_tasks)
+
+    workers = min(workers or 1, len(pending))
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(scan_range, scan_args))
+        results = pool.imap(_scan_task, pending)
+    else:
+        _init_worker(scan_range, scan_args)
+        results = map(_scan_task, pending)
+
+    cache_writer = None
+    try:
+        for file_path, file_tasks, fingerprint, entry in plan:
+            if entry is not None:
+                print(f"Processing file (cached): {file_path}")
+                if sink:
+                    for rows in cache.iter_rows(entry):
+                        sink.write_rows(rows)
+                continue
+
+            print(f"Processing file: {file_path}")
+            if fingerprint is not None:
+                cache_writer = cache.writer(file_path, fingerprint)
+            lines_before = 0
+            file_complete = True
+            for _ in file_tasks:
+                _, _, first_line, rows, line_count, complete = next(results)
+                file_complete = file_complete and complete
+                if first_line is not None:
+                    lines_before = first_line - 1
+                if lines_before:
+                    for row in rows:
+                        for column in line_columns:
+                            row[column] += lines_before
+                lines_before += line_count
+                if sink:
+                    sink.write_rows(rows)
+                if cache_writer:
+                    cache_writer.write_rows(rows)
+            if cache_writer:
+                if file_complete:
+                    cache_writer.commit()
+                else:
+                    print(f"Not caching results of {file_path}: the scan did not complete")
+                    cache_writer.discard()
+                cache_writer = None
+    except BaseException:
+        if cache_writer:
+            cache_writer.discard()
+        if pool:
+            pool.terminate()
+        raise
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
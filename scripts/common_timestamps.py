@@ -0,0 +1,194 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+
+MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12,
+}
+
+class TimestampFormat:
+    """
+    A registered timestamp form: a detection pattern (without capturing groups of its own)
+    and a batch converter. convert(texts, year) receives the matched strings of one chunk and
+    returns, in the same order, 'YYYY-MM-DD HH:MM:SS' strings or None for invalid ones.
+    """
+
+    def __init__(self, name, pattern, convert):
+        self.name = name
+        self.pattern = pattern
+        self.convert = convert
+
+# Registered forms, in the order they are tried at the same position of a line
+TIMESTAMP_FORMATS = []
+
+_combined_pattern = None
+
+def register_timestamp_format(name, pattern, convert, before=None):
+    """
+    Adds a timestamp form to the registry (replacing one of the same name), optionally ahead
+    of the form named `before`. All forms are detected by one combined regex, so a new form
+    does not add another pass over each line.
+    """
+    global _combined_pattern
+    TIMESTAMP_FORMATS[:] = [form for form in TIMESTAMP_FORMATS if form.name != name]
+    position = len(TIMESTAMP_FORMATS)
+    if before is not None:
+        position = next(
+            (index for index, form in enumerate(TIMESTAMP_FORMATS) if form.name == before), position
+        )
+    TIMESTAMP_FORMATS.insert(position, TimestampFormat(name, pattern, convert))
+    _combined_pattern = None
+
+def timestamp_pattern():
+    """
+    Returns the combined regex of all registered forms; the matching group names the form.
+    """
+    global _combined_pattern
+    if _combined_pattern is None:
+        _combined_pattern = re.compile(
+            '|'.join(f'(?P<{form.name}>{form.pattern})' for form in TIMESTAMP_FORMATS)
+        )
+    return _combined_pattern
+
+def find_timestamp_candidates(line):
+    """
+    Returns every (form_name, text) timestamp candidate in a line, left to right.
+    """
+    return [(match.lastgroup, match.group()) for match in timestamp_pattern().finditer(line)]
+
+def convert_timestamps(form_name, texts, year):
+    """
+    Converts a batch of matched strings of one form; returns {text: 'YYYY-MM-DD HH:MM:SS' or None}.
+    """
+    texts = list(dict.fromkeys(texts))
+    form = next(form for form in TIMESTAMP_FORMATS if form.name == form_name)
+    return dict(zip(texts, form.convert(texts, year)))
+
+def resolve_timestamps(candidate_lists, year):
+    """
+    Converts the candidates of a batch of lines at once, one converter call per form, and
+    returns each line's first valid timestamp ('YYYY-MM-DD HH:MM:SS') or None.
+    Syslog timestamps carry no year, so `year` is used for them.
+    """
+    texts_by_form = {}
+    for candidates in candidate_lists:
+        for form_name, text in candidates:
+            texts_by_form.setdefault(form_name, []).append(text)
+    converted = {
+        form_name: convert_timestamps(form_name, texts, year) for form_name, texts in texts_by_form.items()
+    }
+    return [
+        next((converted[form_name][text] for form_name, text in candidates if converted[form_name][text]), None)
+        for candidates in candidate_lists
+    ]
+
+def hour_buckets(lines, default_year=None):
+    """
+    Returns the hour of the first valid timestamp of each line as 'YYYY-MM-DD HH:00', or None,
+    using the same registered forms as the timeline. Syslog timestamps carry no year, so
+    default_year (the current year if None) is used.
+    """
+    timestamps = resolve_timestamps(
+        [find_timestamp_candidates(line) for line in lines], default_year or datetime.now().year
+    )
+    return [f"{timestamp[:13]}:00" if timestamp else None for timestamp in timestamps]
+
+def _formatted(values):
+    """
+    Formats a pandas datetime Series (NaT for failures) as 'YYYY-MM-DD HH:MM:SS' strings or None.
+    """
+    return [value if isinstance(value, str) else None for value in values.dt.strftime('%Y-%m-%d %H:%M:%S')]
+
+_MONTHS_LOWER = {name.lower(): number for name, number in MONTHS.items()}
+
+# Logs repeat the same second many times, so conversions are memoized per matched string
+TIMESTAMP_CACHE_SIZE = 1 << 16
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def convert_timestamp(form, text, year):
+    """
+    Converts a syslog, sql or clf match to 'YYYY-MM-DD HH:MM:SS' with integer arithmetic and a
+    month table, or returns None if it is not a real date and time.
+    Syslog timestamps carry no year, so `year` is used for them.
+    """
+    if form == 'syslog':
+        month_name, day, clock = text.split(' ')
+        month = _MONTHS_LOWER.get(month_name.lower())
+        day = int(day)
+    elif form == 'sql':
+        year, month, day, clock = int(text[0:4]), int(text[5:7]), int(text[8:10]), text[11:]
+    else:
+        day, month, year, clock = int(text[0:2]), _MONTHS_LOWER.get(text[3:6].lower()), int(text[7:11]), text[12:]
+    if month is None:
+        return None
+    hour, minute, second = int(clock[0:2]), int(clock[3:5]), int(clock[6:8])
+    try:
+        # Only to reject impossible dates such as Feb 30 or hour 24
+        datetime(year, month, day, hour, minute, second)
+    except ValueError:
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:02d}"
+
+def _fixed_converter(form):
+    """
+    Returns a batch converter for a fixed-layout form. Slicing is as fast as pd.to_datetime on
+    unseen strings, and the memo makes seconds repeated across batches nearly free.
+    """
+    def convert(texts, year):
+        return [convert_timestamp(form, text, year) for text in texts]
+    return convert
+
+def _convert_iso8601(texts, year):
+    import pandas as pd
+
+    # Offsets are applied, so timestamps from different zones line up in UTC
+    values = pd.to_datetime(pd.Series(texts, dtype=object), format='ISO8601', utc=True, errors='coerce')
+    return _formatted(values)
+
+def _convert_rfc5424(texts, year):
+    # <PRI>VERSION TIMESTAMP ...: the timestamp is ISO 8601
+    return _convert_iso8601([text.split(' ', 1)[1] for text in texts], year)
+
+_EPOCH_DIGITS = re.compile(r'\d+(?:\.\d+)?$')
+
+def _epoch_converter(default_unit):
+    def convert(texts, year):
+        import pandas as pd
+
+        seconds = []
+        for text in texts:
+            number = _EPOCH_DIGITS.search(text)
+            value = float(number.group()) if number else float('nan')
+            if default_unit == 'auto' and number and '.' not in number.group() and len(number.group()) == 13:
+                value /= 1000
+            elif default_unit == 'us':
+                value /= 1000000
+            seconds.append(value)
+        return _formatted(pd.to_datetime(pd.Series(seconds, dtype=float), unit='s', errors='coerce'))
+    return convert
+
+_ISO8601 = r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?'
+
+# RFC 5424 syslog header: <PRI>1 2024-01-31T13:45:00.003Z
+register_timestamp_format('rfc5424', rf'<\d{{1,3}}>1 {_ISO8601}', _convert_rfc5424)
+# journald export/JSON: __REALTIME_TIMESTAMP=1706708700123456 (microseconds)
+register_timestamp_format(
+    'journald', r'__REALTIME_TIMESTAMP"?\s*[=:]\s*"?\d{16}', _epoch_converter('us')
+)
+# Epoch seconds or milliseconds, only next to a timestamp key or in audit records, so plain
+# 10-digit numbers are not taken for times: time=1706708700, "ts": 1706708700123, audit(1706708700.123:42)
+register_timestamp_format(
+    'epoch',
+    r'(?:\b(?:time|timestamp|ts|epoch)["\']?\s*[=:]\s*["\']?1\d{9}(?:\d{3}|\.\d{1,6})?\b)'
+    r'|(?:audit\(1\d{9}\.\d{3}(?=:))',
+    _epoch_converter('auto')
+)
+# ISO 8601 with 'T' and an optional fraction and zone: 2024-01-31T13:45:00.123+01:00
+register_timestamp_format('iso8601', _ISO8601, _convert_iso8601)
+# Syslog (Jan 31 13:45:00, no year; also the prefix of Jan 31 13:45:00.123456)
+register_timestamp_format('syslog', r'\w{3} \d{1,2} \d{2}:\d{2}:\d{2}', _fixed_converter('syslog'))
+# SQL style (2024-01-31 13:45:00)
+register_timestamp_format('sql', r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}', _fixed_converter('sql'))
+# Apache/NCSA (31/Jan/2024:13:45:00)
+register_timestamp_format('clf', r'\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2}', _fixed_converter('clf'))
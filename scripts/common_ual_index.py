@@ -0,0 +1,208 @@
+import os
+import sqlite3
+from functools import lru_cache
+
+from common_paths import get_toolkit_dirs
+
+# Built by parse_kstrike.py from every UAL database (Current.mdb, {GUID}.mdb) under _input
+UAL_INDEX_FILE_NAME = 'ual_index.sqlite'
+
+# Lookups repeat the same addresses over and over, so results are cached per address
+UAL_LOOKUP_CACHE_SIZE = 1 << 16
+
+def get_ual_index_path():
+    """
+    Returns the location of the UAL correlation index, tmp/ual_index.sqlite.
+    """
+    return os.path.join(get_toolkit_dirs()['tmp_dir'], UAL_INDEX_FILE_NAME)
+
+def open_ual_index(index_path):
+    connection = sqlite3.connect(index_path)
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS databases (
+            db_id INTEGER PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS dns (
+            address TEXT NOT NULL,
+            hostname TEXT NOT NULL,
+            db_id INTEGER NOT NULL,
+            PRIMARY KEY (address, hostname, db_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS roles (
+            address TEXT NOT NULL,
+            role_name TEXT NOT NULL,
+            db_id INTEGER NOT NULL,
+            PRIMARY KEY (address, role_name, db_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS dns_db ON dns (db_id);
+        CREATE INDEX IF NOT EXISTS roles_db ON roles (db_id);
+    """)
+    return connection
+
+def _delete_database(connection, db_id):
+    connection.execute("DELETE FROM dns WHERE db_id = ?", (db_id,))
+    connection.execute("DELETE FROM roles WHERE db_id = ?", (db_id,))
+    connection.execute("DELETE FROM databases WHERE db_id = ?", (db_id,))
+
+def stale_databases(paths, index_path=None):
+    """
+    Returns the databases among `paths` that are not in the index or changed since they were
+    indexed (size or modification time differ).
+    """
+    index_path = index_path or get_ual_index_path()
+    if not os.path.exists(index_path):
+        return list(paths)
+    connection = open_ual_index(index_path)
+    try:
+        indexed = {
+            row[0]: row[1:] for row in connection.execute("SELECT path, size, mtime_ns FROM databases")
+        }
+    finally:
+        connection.close()
+    stale = []
+    for path in paths:
+        stat = os.stat(path)
+        if indexed.get(os.path.abspath(path)) != (stat.st_size, stat.st_mtime_ns):
+            stale.append(path)
+    return stale
+
+def update_ual_index(path, correlations, keep_paths=None, index_path=None):
+    """
+    Stores the correlations read from UAL databases: `correlations` yields
+    (database_path, dns_pairs, role_pairs), with (address, hostname) and (address, role_name)
+    pairs. Each list given replaces the previous entries of that database; None keeps them.
+    Storing dns_pairs records the database's size and modification time, so it is no longer
+    stale; role_pairs alone are only stored for databases already in the index. With
+    keep_paths, indexed databases under `path` that are not in it (deleted since) are dropped.
+    """
+    index_path = index_path or get_ual_index_path()
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    connection = open_ual_index(index_path)
+    try:
+        indexed = {
+            row[0]: row[1] for row in connection.execute("SELECT path, db_id FROM databases")
+        }
+        for database_path, dns_pairs, role_pairs in correlations:
+            database_path = os.path.abspath(database_path)
+            db_id = indexed.get(database_path)
+            if db_id is None and dns_pairs is None:
+                continue
+            try:
+                if dns_pairs is not None:
+                    stat = os.stat(database_path)
+                    if db_id is None:
+                        db_id = connection.execute(
+                            "INSERT INTO databases (path, size, mtime_ns) VALUES (?, ?, ?)",
+                            (database_path, stat.st_size, stat.st_mtime_ns)
+                        ).lastrowid
+                    else:
+                        connection.execute(
+                            "UPDATE databases SET size = ?, mtime_ns = ? WHERE db_id = ?",
+                            (stat.st_size, stat.st_mtime_ns, db_id)
+                        )
+                    connection.execute("DELETE FROM dns WHERE db_id = ?", (db_id,))
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO dns (address, hostname, db_id) VALUES (?, ?, ?)",
+                        ((address, hostname, db_id) for address, hostname in dns_pairs)
+                    )
+                if role_pairs is not None:
+                    connection.execute("DELETE FROM roles WHERE db_id = ?", (db_id,))
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO roles (address, role_name, db_id) VALUES (?, ?, ?)",
+                        ((address, role_name, db_id) for address, role_name in role_pairs)
+                    )
+                connection.commit()
+                indexed[database_path] = db_id
+            except Exception as e:
+                connection.rollback()
+                print(f"An error occurred while indexing {database_path}: {e}")
+
+        if keep_paths is not None:
+            prefix = os.path.join(os.path.abspath(path), '')
+            keep = {os.path.abspath(keep_path) for keep_path in keep_paths}
+            for database_path, db_id in indexed.items():
+                if database_path.startswith(prefix) and database_path not in keep:
+                    _delete_database(connection, db_id)
+            connection.commit()
+    finally:
+        connection.close()
+
+class UalIndex:
+    """
+    Read access to the UAL correlation index. hostnames(address) and roles(address) are one
+    primary-key range lookup each, across every indexed database, and are cached per address.
+    Each process opens its own instance.
+    """
+
+    def __init__(self, index_path=None):
+        index_path = index_path or get_ual_index_path()
+        self.index_path = index_path
+        self._connection = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+        self.hostnames = lru_cache(maxsize=UAL_LOOKUP_CACHE_SIZE)(self._hostnames)
+        self.roles = lru_cache(maxsize=UAL_LOOKUP_CACHE_SIZE)(self._roles)
+
+    def _hostnames(self, address):
+        """
+        Returns the hostnames the DNS tables of all indexed databases map an address to.
+        """
+        return [row[0] for row in self._connection.execute(
+            "SELECT DISTINCT hostname FROM dns WHERE address = ? ORDER BY hostname", (address,)
+        )]
+
+    def _roles(self, address):
+        """
+        Returns the server roles an address accessed according to the CLIENTS tables.
+        """
+        return [row[0] for row in self._connection.execute(
+            "SELECT DISTINCT role_name FROM roles WHERE address = ? ORDER BY role_name", (address,)
+        )]
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class UalEnrichedSink:
+    """
+    Wraps a ResultSink (or SummarySink) and inserts 'ual_hostnames' and 'ual_roles' fields,
+    looked up in a UalIndex by the address in row[address_column], before the last field of
+    every row. The header passed to the wrapped sink must already contain both columns.
+    """
+
+    header_fields = ['ual_hostnames', 'ual_roles']
+
+    def __init__(self, sink, ual_index, address_column):
+        self.sink = sink
+        self.ual_index = ual_index
+        self.address_column = address_column
+
+    def _enrich(self, row):
+        address = row[self.address_column]
+        return [
+            *row[:-1],
+            '; '.join(self.ual_index.hostnames(address)),
+            '; '.join(self.ual_index.roles(address)),
+            row[-1],
+        ]
+
+    def write_row(self, row):
+        self.sink.write_row(self._enrich(row))
+
+    def write_rows(self, rows):
+        self.sink.write_rows([self._enrich(row) for row in rows])
+
+    def close(self):
+        self.sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
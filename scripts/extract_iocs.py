@@ -0,0 +1,185 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+from ipaddress import IPv6Address
+from urllib.parse import urlsplit
+
+from common_paths import get_toolkit_dirs
+from common_ipv4 import IPV4_PATTERN
+from common_output import ResultSink, build_output_path, prompt_output_format
+from common_scan import DEFAULT_WORKERS, scan_input, iter_range_lines, count_range_lines
+from common_cache import ResultCache
+
+# Bump when the patterns change, so cached per-file results are not reused
+IOC_PATTERNS_VERSION = 1
+
+# Dotted names that are almost always file names rather than domains
+_FILE_EXTENSIONS = {
+    'bat', 'bin', 'cfg', 'conf', 'csv', 'dat', 'db', 'dll', 'doc', 'docx', 'exe', 'gif', 'gz',
+    'htm', 'html', 'ini', 'jpeg', 'jpg', 'js', 'json', 'lnk', 'log', 'msi', 'pdf', 'php', 'png',
+    'ps1', 'py', 'sh', 'sys', 'tmp', 'txt', 'vbs', 'xls', 'xlsx', 'xml', 'yaml', 'yml', 'zip',
+}
+
+# One alternation, so each line is scanned once for every indicator type.
+# URLs and emails come first: the host inside them is reported separately as a domain or IPv4.
+IOC_PATTERN = re.compile(
+    r"(?P<url>\b(?:https?|ftp)://[^\s<>\"'`]+)"
+    r"|(?P<email>\b[A-Za-z0-9._%+-]+@(?:[A-Za-z0-9-]+\.)+[A-Za-z]{2,63}\b)"
+    r"|(?P<hash>\b[0-9A-Fa-f]{32}(?:[0-9A-Fa-f]{8}(?:[0-9A-Fa-f]{24})?)?\b)"
+    r"|(?P<ipv6>(?<![0-9A-Za-z:.])(?:[0-9A-Fa-f]{0,4}:){2,7}[0-9A-Fa-f]{0,4}(?![0-9A-Za-z:.]))"
+    rf"|(?P<ipv4>{IPV4_PATTERN.pattern})"
+    r"|(?P<domain>\b(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,63}\b(?![@-]))"
+)
+
+_HASH_TYPES = {32: 'md5', 40: 'sha1', 64: 'sha256'}
+
+@lru_cache(maxsize=1 << 16)
+def _normalise_ipv6(candidate):
+    """
+    Returns the compressed form of an IPv6 candidate, or None if it is not an address
+    (e.g. a time such as 12:30:45).
+    """
+    if candidate == '::':
+        return None
+    try:
+        return IPv6Address(candidate).compressed
+    except ValueError:
+        return None
+
+def _host_iocs(host):
+    """
+    Classifies the host part of a URL or email address.
+    """
+    if IPV4_PATTERN.fullmatch(host):
+        return [('ipv4', host)]
+    match = IOC_PATTERN.fullmatch(host)
+    if match and match.lastgroup == 'domain':
+        return [('domain', host)]
+    return []
+
+def line_iocs(line):
+    """
+    Returns the (ioc_type, ioc_value) pairs found in a line, in order of appearance.
+    Types: ipv4, ipv6, domain, url, email, md5, sha1, sha256.
+    """
+    iocs = []
+    for match in IOC_PATTERN.finditer(line):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == 'url':
+            value = value.rstrip('.,;:!?)]}')
+            iocs.append(('url', value))
+            try:
+                host = urlsplit(value).hostname
+            except ValueError:
+                host = None
+            if host:
+                iocs.extend(_host_iocs(host))
+        elif kind == 'email':
+            value = value.lower()
+            iocs.append(('email', value))
+            iocs.extend(_host_iocs(value.rsplit('@', 1)[1]))
+        elif kind == 'hash':
+            iocs.append((_HASH_TYPES[len(value)], value.lower()))
+        elif kind == 'ipv6':
+            value = _normalise_ipv6(value)
+            if value:
+                iocs.append(('ipv6', value))
+        elif kind == 'domain':
+            value = value.lower()
+            if value.rsplit('.', 1)[1] not in _FILE_EXTENSIONS:
+                iocs.append(('domain', value))
+        else:
+            iocs.append((kind, value))
+    return iocs
+
+def ioc_search(file_path, start=0, end=None):
+    """
+    Extracts every indicator from a file, or from its byte range [start, end), in one pass.
+    Returns (rows, line_count, complete) with one [ioc_type, ioc_value, count, source_file, first_line,
+    last_line] row per distinct indicator, line numbers counted from `start`, and complete False if
+    the range could not be read to the end.
+    """
+    found = {}
+    line_number = 0
+    complete = True
+    try:
+        for line_number, line in enumerate(iter_range_lines(file_path, start, end), start=1):
+            for ioc in line_iocs(line):
+                seen = found.get(ioc)
+                if seen is None:
+                    found[ioc] = [1, line_number, line_number]
+                else:
+                    seen[0] += 1
+                    seen[2] = line_number
+    except Exception as e:
+        print(f"An error occurred while processing {file_path}: {e}")
+        line_number = count_range_lines(file_path, start, end)
+        complete = False
+    rows = [
+        [ioc_type, ioc_value, count, file_path, first_line, last_line]
+        for (ioc_type, ioc_value), (count, first_line, last_line) in found.items()
+    ]
+    return rows, line_number, complete
+
+class IocTally:
+    """
+    Merges the per-range rows of ioc_search into one entry per indicator:
+    total count plus the file and line where it was first and last seen.
+    Rows must arrive in file and line order, as scan_input delivers them.
+    """
+
+    header = ['ioc_type', 'ioc_value', 'count', 'first_file', 'first_line', 'last_file', 'last_line']
+
+    def __init__(self):
+        self.iocs = {}
+
+    def write_rows(self, rows):
+        for ioc_type, ioc_value, count, file_path, first_line, last_line in rows:
+            entry = self.iocs.get((ioc_type, ioc_value))
+            if entry is None:
+                self.iocs[(ioc_type, ioc_value)] = [count, file_path, first_line, file_path, last_line]
+            else:
+                entry[0] += count
+                entry[3] = file_path
+                entry[4] = last_line
+
+    def rows(self):
+        """
+        Returns the tallied rows, grouped by type and most frequent first.
+        """
+        return [
+            [ioc_type, ioc_value, *entry]
+            for (ioc_type, ioc_value), entry in sorted(
+                self.iocs.items(), key=lambda item: (item[0][0], -item[1][0], item[0][1])
+            )
+        ]
+
+def extract_iocs(file_path, output_file, workers=DEFAULT_WORKERS):
+    """
+    Extracts IPv4/IPv6 addresses, domains, URLs, email addresses and MD5/SHA-1/SHA-256 hashes
+    from the given file path (file or directory) and writes one deduplicated row per indicator.
+    """
+    tally = IocTally()
+    try:
+        cache = ResultCache('iocs', [IOC_PATTERNS_VERSION])
+        scan_input(file_path, ioc_search, (), tally, workers, line_column=(4, 5), cache=cache)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return
+
+    with ResultSink(output_file, IocTally.header) as sink:
+        sink.write_rows(tally.rows())
+    print(f"Extracted {len(tally.iocs)} distinct indicators to {output_file}")
+
+if __name__ == "__main__":
+    dirs = get_toolkit_dirs()
+    default_input_directory = dirs['input_dir']
+    default_output_directory = dirs['output_dir']
+
+    output_format = prompt_output_format()
+
+    current_datetime = datetime.now().strftime("%Y%m%d%H%M%S")
+    output_file = build_output_path(default_output_directory, f"{current_datetime}_iocs", output_format)
+
+    extract_iocs(default_input_directory, output_file)
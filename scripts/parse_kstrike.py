@@ -57,29 +57,22 @@ import binascii
 import struct
 import socket
 import textwrap
-from datetime import timedelta, datetime
+import multiprocessing
+from calendar import isleap
+from functools import lru_cache
+from datetime import MAXYEAR, MINYEAR, date, timedelta, datetime
 import pyesedb
 
 # We import from a sibling file in the same directory
 from common_paths import get_toolkit_dirs
+from common_scan import DEFAULT_WORKERS, iter_input_files
+from common_output import ResultSink, build_output_path, prompt_output_format
+from common_ual_index import UalIndex, get_ual_index_path, stale_databases, update_ual_index
 
 # -------------------------------------------------------------------------------------------
-# GLOBAL VARIABLES & DICTIONARIES (based on your original script)
+# CONSTANTS & LOOKUP TABLES
 # -------------------------------------------------------------------------------------------
 kstrikeversionnumber = "20210624"  # KStrike version
-StartTime = time.time()            # Record script start time
-
-insertdatefourofyear = []
-insertdateyyyymmdd = []
-lastaccessfourofyear = []
-lastaccessyyyymmdd = []
-insertdatehour = []
-insertdateday = []
-clienttablenumber = None
-dnstablenumber = None
-totalcountofaccesses = []
-badyeardetector = []
-correlatedtwoaccessmismatchyear = "No"
 
 Column_Dict = {
     0:'NULL', 1:'Text', 2:'Integer', 3:'Integer', 4:'Integer', 5:'Integer',
@@ -122,326 +115,503 @@ GUID_Dict = {
     '{4AD13311-EC3B-447E-9056-14EDE9FA7052}':'Active Directory Lightweight Directory Services'
 }
 
-DNS_Dict = {}
-
-# These will be updated as we parse columns
-Column_Name = ""
-Table_name = ""
 
 # -------------------------------------------------------------------------------------------
-# HELPER FUNCTIONS
+# COLUMN READERS
+# One reader per ESE column type, looked up once per table instead of once per cell
 # -------------------------------------------------------------------------------------------
 
 def win_date_bin_to_datetime(win_date_bin):
-    """Converts the datetime field of the CLIENTS table specifically (Windows FILETIME)."""
-    global insertdatefourofyear, insertdateyyyymmdd
-    global lastaccessfourofyear, lastaccessyyyymmdd
-    global insertdatehour, insertdateday
-    global Column_Name
-
+    """
+    Converts a Windows FILETIME value (8 bytes, little-endian) to a datetime, or None if it
+    is out of range.
+    """
     decimaldate = int(struct.unpack("<Q", win_date_bin)[0])
     try:
-        windowsdt = datetime(1601,1,1,0,0,0) + timedelta(microseconds=decimaldate/10)
-    except:
-        windowsdt = "UNRECOGNIZED TIMESTAMP"
-    sys.stdout.write(str(windowsdt) + "||")
-
-    fourofyear = str(windowsdt)[0:4]
-    fullyyyymmdd = str(windowsdt)[0:10]
-    twoofhour = str(windowsdt)[11:13]
-    twoofdate = str(windowsdt)[8:10]
-
-    if (len(fourofyear) == 4 and Column_Name == "InsertDate"):
-        insertdatefourofyear = fourofyear
-        insertdateyyyymmdd = fullyyyymmdd
-        insertdatehour = twoofhour
-        insertdateday = twoofdate
-    elif (len(fourofyear) == 4 and Column_Name == "LastAccess"):
-        lastaccessfourofyear = fourofyear
-        lastaccessyyyymmdd = fullyyyymmdd
-
-def Check_Column_Type(Table_Record, Column_Type, Column_Number, Record_List, Table_name):
-    """
-    Reads column data based on type and prints/appends the results to Record_List or stdout.
-    This is the original KStrike logic for enumerating DNS and CLIENTS columns.
-    """
-    global DNS_Dict, Column_Name
-    global totalcountofaccesses
-    global correlatedtwoaccessmismatchyear, badyeardetector
-    global insertdatefourofyear, lastaccessfourofyear
-    global insertdateyyyymmdd, lastaccessyyyymmdd
-    global insertdatehour, insertdateday
-
-    if Column_Type == 0:
-       return
-    elif Column_Type in [2,3,4,5]:  # Some integer variant
-       val = Table_Record.get_value_data_as_integer(Column_Number)
-       return Record_List.append(val)
-    elif Column_Type in [6,7]:      # Real / Double
-       val = Table_Record.get_value_data_as_floating_point(Column_Number)
-       return Record_List.append(val)
-    elif Column_Type == 1:          # Boolean => text
-       val = Table_Record.get_value_data(Column_Number)
-       if val is None:
-           return Record_List.append('NULL')
-       else:
-           return Record_List.append(str(val.decode('utf-16', 'ignore')))
-    elif Column_Type == 8:          # DATETIME
-       val = Table_Record.get_value_data(Column_Number)
-       if val is None:
-          return Record_List.append('')
-       elif Table_name == "DNS":
-          return Record_List.append('')
-       else:
-          return Record_List.append(win_date_bin_to_datetime(val))
-    elif Column_Type == 9:          # BINARY_DATA_TO_HEX (IPv4, IPv6, or MAC checks)
-       val = Table_Record.get_value_data(Column_Number)
-       if val is None:
-          sys.stdout.write("NO BINARY_DATA_TO_HEX||NO BINARY_DATA_TO_HEX||")
-       else:
-          hexdb = binascii.hexlify(val)
-          macaddress = hexdb.decode('utf-8', 'ignore')
-          # IP or MAC address checks
-          if ((len(hexdb) <= 8) and (Column_Name == "Address")):
-              # IPv4 conversion
-              if len(hexdb) < 8:
-                  hexdb = b'0' + hexdb
-              ipaddr = "%i.%i.%i.%i" % (
-                  int(hexdb[0:2],16), 
-                  int(hexdb[2:4],16), 
-                  int(hexdb[4:6],16), 
-                  int(hexdb[6:8],16)
-              )
-              raw_ipaddr_correlations = DNS_Dict.get(ipaddr, "No Match for IP address found")
-              ipaddr_correlations = str(raw_ipaddr_correlations).strip("[]")
-              sys.stdout.write(macaddress.upper() + "||" + ipaddr + " (" + ipaddr_correlations + ")||")
-          elif (((macaddress[:4] == "fe80") or (macaddress[:4] == "2001")) 
-                and (Column_Name == "Address") 
-                and (len(hexdb) == 32)):
-              # IPv6
-              colonaddedtohexdb = ':'.join(macaddress[i:i+4] for i in range(0, len(macaddress), 4))
-              ipv6Parts = colonaddedtohexdb.split(":")
-              macParts = []
-              for ipv6Part in ipv6Parts[-4:]:
-                  while len(ipv6Part) < 4:
-                      ipv6Part = "0" + ipv6Part
-                  macParts.append(ipv6Part[:2])
-                  macParts.append(ipv6Part[-2:])
-              macParts[0] = "%02x" % (int(macParts[0], 16) ^ 2)
-              del macParts[4]
-              del macParts[3]
-              finalmac = ":".join(macParts).upper()
-              sys.stdout.write(macaddress.upper() + "||" + colonaddedtohexdb + " IPv6 MAC: " + finalmac + "||")
-          elif ((macaddress == "00000000000000000000000000000001")
-                and (Column_Name == "Address") 
-                and (len(hexdb) == 32)):
-              # Localhost IPv6
-              sys.stdout.write(macaddress.upper() + "||Local Host ::1||")
-          else:
-              sys.stdout.write(macaddress.upper() + "||Unable to convert data||")
-
-    elif Column_Type == 10:         # TEXT
-       val = Table_Record.get_value_data(Column_Number)
-       if val is None:
-          return Record_List.append('')
-       else:
-          return Record_List.append(val.decode('utf-16', 'ignore'))
-
-    elif Column_Type == 11:         # LARGE_BINARY_DATA
-       val = Table_Record.get_value_data(Column_Number)
-       if val is None:
-          return Record_List.append('')
-       else:
-          return Record_List.append(val)
-
-    elif Column_Type == 12:         # LARGE_TEXT
-       val = Table_Record.get_value_data(Column_Number)
-       if val is None:
-           sys.stdout.write("<BLANK>||")
-           return
-       else:
-           # Possibly DNS IP or hostname
-           decoded_val = val.decode('utf-16', 'ignore').replace('\x00', '')
-           if (Column_Name == "Address" and Table_name == "DNS"):
-               global ip_address_from_dns
-               ip_address_from_dns = decoded_val
-           elif (Column_Name == "HostName" and Table_name == "DNS"):
-               hostname_from_dns = decoded_val
-               if ip_address_from_dns in DNS_Dict:
-                   DNS_Dict[ip_address_from_dns].append(hostname_from_dns)
-               else:
-                   DNS_Dict[ip_address_from_dns] = [hostname_from_dns]
-           else:
-               # Generic large text
-               if len(decoded_val) > 1:
-                   sys.stdout.write(decoded_val + "||")
-               else:
-                   sys.stdout.write("<BLANK>||")
-
-    elif Column_Type == 13:         # SUPER_LARGE_VALUE
-       val = Table_Record.get_value_data_as_integer(Column_Number)
-       return Record_List.append(val)
-
-    elif Column_Type == 14:         # INTEGER_32BIT_UNSIGNED
-       val = Table_Record.get_value_data_as_integer(Column_Number)
-       if Column_Name == "TotalAccesses":
-           totalcountofaccesses = str(val)
-           sys.stdout.write(str(val) + "||")
-       else:
-           sys.stdout.write(str(val) + "||")
-
-    elif Column_Type == 15:         # INTEGER_64BIT_SIGNED
-       val = Table_Record.get_value_data_as_integer(Column_Number)
-       return Record_List.append(val)
-
-    elif Column_Type == 16:         # GUID
-       val = Table_Record.get_value_data(Column_Number)
-       if val is None:
-           sys.stdout.write("NO GUID DATA||")
-       else:
-          orgguid = uuid.UUID(bytes_le=val)
-          urnguid = orgguid.urn
-          rawguid = urnguid[9:].upper()
-          fullguid = '{' + rawguid + '}'
-          if Column_Name == "RoleGuid":
-              GUID_conversion = GUID_Dict.get(fullguid, "No Match for GUID found")
-              sys.stdout.write(fullguid + " (" + GUID_conversion + ")||")
-          else:
-              sys.stdout.write(fullguid + "||")
-
-    elif Column_Type == 17:         # INTEGER_16BIT_UNSIGNED
-       val = Table_Record.get_value_data_as_integer(Column_Number)
-       if (val is not None) and ("Day" in Column_Name):
-           import datetime
-           if ((int(insertdatefourofyear) != int(lastaccessfourofyear))
-               and (Column_Name != "Day1")
-               and (totalcountofaccesses == "2")):
-               if correlatedtwoaccessmismatchyear != "Yes":
-                   sys.stdout.write(insertdateyyyymmdd + ":1, " + lastaccessyyyymmdd + ":1")
-                   correlatedtwoaccessmismatchyear = "Yes"
-           else:
-               if ((int(insertdatefourofyear) != int(lastaccessfourofyear))
-                   and (Column_Name != "Day1")
-                   and (totalcountofaccesses > "2")
-                   and (badyeardetector != "Yes")):
-                   sys.stdout.write("**** WARNING: Multiple years detected, correlated \"DatesAndAccesses\" may not be accurate **** ")
-                   badyeardetector = "Yes"
-               # Check potential year rollover
-               if (Column_Name == "Day1") and (insertdatehour == '23') and (insertdateday == '31'):
-                   insertdatefourofyear = str(int(insertdatefourofyear) + 1)
-               day_str = Column_Name[3:]
-               testingd = datetime.datetime.strptime(f'{day_str} {insertdatefourofyear}', '%j %Y')
-               fullconvjd = testingd.strftime("%Y-%m-%d")
-               sys.stdout.write(fullconvjd + ": " + str(val) + ", ")
-       elif val is not None:
-           sys.stdout.write(Column_Name + " " + str(val) + ",")
-       else:
-           sys.stdout.write("")
-
-def parse_single_esedb(path_to_esedb):
-    """
-    Parses a SINGLE .mdb file, enumerating DNS and CLIENTS tables
-    with the original KStrike logic. Writes to stdout.
-    """
-    global dnstablenumber, clienttablenumber
-    global Column_Name, Table_name
-    global StartTime, correlatedtwoaccessmismatchyear, badyeardetector
-    global ip_address_from_dns
-
-    # Reset table indices for each new file
-    dnstablenumber = None
-    clienttablenumber = None
+        return datetime(1601,1,1,0,0,0) + timedelta(microseconds=decimaldate/10)
+    except OverflowError:
+        return None
+
+def _read_integer(Table_Record, Column_Number):
+    return Table_Record.get_value_data_as_integer(Column_Number)
+
+def _read_real(Table_Record, Column_Number):
+    return Table_Record.get_value_data_as_floating_point(Column_Number)
+
+def _read_datetime(Table_Record, Column_Number):
+    val = Table_Record.get_value_data(Column_Number)
+    return None if val is None else win_date_bin_to_datetime(val)
+
+def _read_binary(Table_Record, Column_Number):
+    return Table_Record.get_value_data(Column_Number)
+
+def _read_text(Table_Record, Column_Number):
+    val = Table_Record.get_value_data(Column_Number)
+    return None if val is None else val.decode('utf-16', 'ignore')
+
+def _read_large_text(Table_Record, Column_Number):
+    val = Table_Record.get_value_data(Column_Number)
+    return None if val is None else val.decode('utf-16', 'ignore').replace('\x00', '')
+
+def _read_guid(Table_Record, Column_Number):
+    val = Table_Record.get_value_data(Column_Number)
+    if val is None:
+        return None
+    return '{' + str(uuid.UUID(bytes_le=val)).upper() + '}'
+
+Column_Readers = {
+    1:_read_text, 2:_read_integer, 3:_read_integer, 4:_read_integer, 5:_read_integer,
+    6:_read_real, 7:_read_real, 8:_read_datetime, 9:_read_binary, 10:_read_text,
+    11:_read_binary, 12:_read_large_text, 13:_read_integer, 14:_read_integer,
+    15:_read_integer, 16:_read_guid, 17:_read_integer
+}
+
+_DAY_COLUMN = re.compile(r'Day(\d+)$')
+
+class TableSchema:
+    """
+    The columns of one ESE table, resolved once: name -> (column number, reader).
+    Day<N> columns of the CLIENTS table are kept apart as (day number, column number) pairs.
+    """
+
+    def __init__(self, Table):
+        self.columns = {}
+        self.day_columns = []
+        for Column_Number in range(Table.get_number_of_columns()):
+            Column = Table.get_column(Column_Number)
+            Column_Name = Column.get_name()
+            day_match = _DAY_COLUMN.match(Column_Name)
+            if day_match:
+                self.day_columns.append((int(day_match.group(1)), Column_Number))
+                continue
+            reader = Column_Readers.get(Column.get_type())
+            if reader is not None:
+                self.columns[Column_Name] = (Column_Number, reader)
+        self.day_columns.sort()
+        # Resolved once, so read_days fetches every Day<N> column of a record in one sweep
+        self.day_numbers = tuple(day_number for day_number, _ in self.day_columns)
+        self.day_column_numbers = tuple(Column_Number for _, Column_Number in self.day_columns)
+
+    def read(self, Table_Record, Column_Name):
+        """
+        Returns the typed value of a column of a record, or None if the table has no such column.
+        """
+        column = self.columns.get(Column_Name)
+        if column is None:
+            return None
+        Column_Number, reader = column
+        return reader(Table_Record, Column_Number)
+
+    def read_days(self, Table_Record):
+        """
+        Returns the (day number, access count) pairs of a record's non-null Day<N> columns.
+        """
+        get_day = Table_Record.get_value_data_as_integer
+        values = [get_day(Column_Number) for Column_Number in self.day_column_numbers]
+        return [(day_number, val) for day_number, val in zip(self.day_numbers, values) if val is not None]
+
+# -------------------------------------------------------------------------------------------
+# RECORDS
+# -------------------------------------------------------------------------------------------
+
+class DnsRecord:
+    """
+    One row of the DNS table: an IP address and a hostname it resolved to.
+    """
+
+    def __init__(self, address, hostname, last_seen):
+        self.address = address
+        self.hostname = hostname
+        self.last_seen = last_seen
+
+class ClientRecord:
+    """
+    One row of the CLIENTS table with typed values: GUIDs as '{...}' strings, dates as datetimes
+    (None if empty), the raw Address bytes and the non-null (day number, access count) pairs.
+    """
+
+    def __init__(self, role_guid, tenant_id, total_accesses, insert_date, last_access,
+                 address, authenticated_user_name, day_counts):
+        self.role_guid = role_guid
+        self.tenant_id = tenant_id
+        self.total_accesses = total_accesses
+        self.insert_date = insert_date
+        self.last_access = last_access
+        self.address = address
+        self.authenticated_user_name = authenticated_user_name
+        self.day_counts = day_counts
+
+    @property
+    def role_name(self):
+        return GUID_Dict.get(self.role_guid, "No Match for GUID found")
+
+def iter_dns_records(Table):
+    """
+    Yields a DnsRecord for every row of a DNS table that has both an address and a hostname.
+    """
+    schema = TableSchema(Table)
+    for t in range(Table.get_number_of_records()):
+        Table_Record = Table.get_record(t)
+        address = schema.read(Table_Record, 'Address')
+        hostname = schema.read(Table_Record, 'HostName')
+        if address and hostname:
+            yield DnsRecord(address, hostname, schema.read(Table_Record, 'LastSeen'))
+
+def iter_client_records(Table):
+    """
+    Yields a ClientRecord for every row of a CLIENTS table.
+    """
+    schema = TableSchema(Table)
+    for t in range(Table.get_number_of_records()):
+        Table_Record = Table.get_record(t)
+        yield ClientRecord(
+            schema.read(Table_Record, 'RoleGuid'),
+            schema.read(Table_Record, 'TenantId'),
+            schema.read(Table_Record, 'TotalAccesses'),
+            schema.read(Table_Record, 'InsertDate'),
+            schema.read(Table_Record, 'LastAccess'),
+            schema.read(Table_Record, 'Address'),
+            schema.read(Table_Record, 'AuthenticatedUserName'),
+            schema.read_days(Table_Record),
+        )
+
+def build_dns_map(dns_records):
+    """
+    Returns {ip_address: [hostname, ...]} from DNS records, hostnames in table order.
+    """
+    DNS_Dict = {}
+    for record in dns_records:
+        DNS_Dict.setdefault(record.address, []).append(record.hostname)
+    return DNS_Dict
+
+# -------------------------------------------------------------------------------------------
+# STRUCTURED OUTPUT
+# -------------------------------------------------------------------------------------------
+
+CLIENTS_HEADER = [
+    'SourceFile', 'RoleGuid', 'RoleName', 'TenantId', 'TotalAccesses', 'InsertDate', 'LastAccess',
+    'RawAddress', 'Address', 'MacAddress', 'HostNames', 'AuthenticatedUserName', 'MultipleYears'
+]
+
+ACCESS_DAYS_HEADER = [
+    'SourceFile', 'RoleGuid', 'RoleName', 'TenantId', 'Address', 'AuthenticatedUserName',
+    'InsertDate', 'AccessDate', 'DayNumber', 'Accesses'
+]
+
+def clients_schema():
+    """
+    Returns the Parquet schema of the CLIENTS output: native timestamps, integer counts and
+    dictionary-encoded columns for the few distinct databases, roles and tenants.
+    """
+    import pyarrow as pa
+
+    return pa.schema([
+        ('SourceFile', pa.dictionary(pa.int32(), pa.string())),
+        ('RoleGuid', pa.dictionary(pa.int32(), pa.string())),
+        ('RoleName', pa.dictionary(pa.int32(), pa.string())),
+        ('TenantId', pa.dictionary(pa.int32(), pa.string())),
+        ('TotalAccesses', pa.int64()),
+        ('InsertDate', pa.timestamp('us')),
+        ('LastAccess', pa.timestamp('us')),
+        ('RawAddress', pa.string()),
+        ('Address', pa.string()),
+        ('MacAddress', pa.string()),
+        ('HostNames', pa.string()),
+        ('AuthenticatedUserName', pa.string()),
+        ('MultipleYears', pa.bool_()),
+    ])
+
+def access_days_schema():
+    """
+    Returns the Parquet schema of the per-day access output.
+    """
+    import pyarrow as pa
+
+    return pa.schema([
+        ('SourceFile', pa.dictionary(pa.int32(), pa.string())),
+        ('RoleGuid', pa.dictionary(pa.int32(), pa.string())),
+        ('RoleName', pa.dictionary(pa.int32(), pa.string())),
+        ('TenantId', pa.dictionary(pa.int32(), pa.string())),
+        ('Address', pa.string()),
+        ('AuthenticatedUserName', pa.string()),
+        ('InsertDate', pa.timestamp('us')),
+        ('AccessDate', pa.date32()),
+        ('DayNumber', pa.int32()),
+        ('Accesses', pa.int64()),
+    ])
+
+def convert_address(val):
+    """
+    Decodes the binary Address column. Returns (raw hex, address, MAC): IPv4 as a dotted quad,
+    IPv6 as colon-separated groups with the MAC of link-local/EUI-64 addresses, '::1' for the
+    loopback. Parts that cannot be decoded are None.
+    """
+    if val is None:
+        return None, None, None
+    hexdb = binascii.hexlify(val)
+    macaddress = hexdb.decode('utf-8', 'ignore')
+    if len(hexdb) <= 8:
+        # IPv4 conversion
+        if len(hexdb) < 8:
+            hexdb = b'0' + hexdb
+        ipaddr = "%i.%i.%i.%i" % (
+            int(hexdb[0:2],16),
+            int(hexdb[2:4],16),
+            int(hexdb[4:6],16),
+            int(hexdb[6:8],16)
+        )
+        return macaddress.upper(), ipaddr, None
+    if (macaddress[:4] == "fe80" or macaddress[:4] == "2001") and len(hexdb) == 32:
+        # IPv6
+        colonaddedtohexdb = ':'.join(macaddress[i:i+4] for i in range(0, len(macaddress), 4))
+        ipv6Parts = colonaddedtohexdb.split(":")
+        macParts = []
+        for ipv6Part in ipv6Parts[-4:]:
+            while len(ipv6Part) < 4:
+                ipv6Part = "0" + ipv6Part
+            macParts.append(ipv6Part[:2])
+            macParts.append(ipv6Part[-2:])
+        macParts[0] = "%02x" % (int(macParts[0], 16) ^ 2)
+        del macParts[4]
+        del macParts[3]
+        finalmac = ":".join(macParts).upper()
+        return macaddress.upper(), colonaddedtohexdb, finalmac
+    if macaddress == "00000000000000000000000000000001":
+        # Localhost IPv6
+        return macaddress.upper(), "::1", None
+    return macaddress.upper(), None, None
+
+@lru_cache(maxsize=None)
+def day_of_year_calendar(year):
+    """
+    Returns the dates of `year` indexed by day number (index 0 is None), built once per year.
+    """
+    if not MINYEAR <= year <= MAXYEAR:
+        return (None,)
+    first_day = date(year, 1, 1)
+    return (None,) + tuple(first_day + timedelta(days=n) for n in range(366 if isleap(year) else 365))
+
+def day_of_year_date(day_number, year):
+    """
+    Returns day `day_number` of `year` as a date, or None if the year has no such day.
+    """
+    calendar_dates = day_of_year_calendar(year)
+    return calendar_dates[day_number] if 0 < day_number < len(calendar_dates) else None
+
+def resolve_access_days(record):
+    """
+    Returns (days, multiple_years) for a ClientRecord, days being (date, day number, accesses)
+    per non-null Day<N> column. Day numbers are days of the InsertDate year; a record inserted
+    at 23:xx on the 31st counts Day1 in the next year. When InsertDate and LastAccess fall in
+    different years, a record with two accesses is resolved to those two dates, and for larger
+    records multiple_years is set because the dates may not be accurate.
+    Without any date on the record, or for Day366 of a non-leap year, the date is None.
+    """
+    insert_date, last_access = record.insert_date, record.last_access
+    if insert_date is None and last_access is None:
+        return [(None, day_number, val) for day_number, val in record.day_counts], False
+
+    insert_year = (insert_date or last_access).year
+    last_year = (last_access or insert_date).year
+    total_accesses = record.total_accesses or 0
+    days = []
+    correlated = False
+    multiple_years = False
+    for day_number, val in record.day_counts:
+        mismatch = insert_year != last_year and day_number != 1
+        if mismatch and total_accesses == 2:
+            if not correlated:
+                days.append((insert_date.date(), None, 1))
+                days.append((last_access.date(), None, 1))
+                correlated = True
+            continue
+        if mismatch and total_accesses > 2:
+            multiple_years = True
+        # Check potential year rollover
+        if day_number == 1 and insert_date is not None and insert_date.hour == 23 and insert_date.day == 31:
+            insert_year += 1
+        days.append((day_of_year_date(day_number, insert_year), day_number, val))
+    return days, multiple_years
+
+def write_client_record(record, resolve_hostnames, source_name, clients_sink, days_sink):
+    """
+    Writes one CLIENTS row for a ClientRecord and one access-days row per day it was seen.
+    IPv4 addresses are enriched with resolve_hostnames(address), a list of hostnames or None.
+    Returns the decoded address (None if it could not be decoded).
+    """
+    raw_address, address, mac_address = convert_address(record.address)
+    hostnames = resolve_hostnames(address) if address is not None and mac_address is None else None
+    days, multiple_years = resolve_access_days(record)
+    role_name = record.role_name if record.role_guid is not None else None
+    clients_sink.write_row([
+        source_name, record.role_guid, role_name, record.tenant_id, record.total_accesses,
+        record.insert_date, record.last_access, raw_address, address, mac_address,
+        '; '.join(hostnames) if hostnames else None, record.authenticated_user_name or None,
+        multiple_years,
+    ])
+    days_sink.write_rows(
+        [source_name, record.role_guid, role_name, record.tenant_id, address,
+         record.authenticated_user_name or None, record.insert_date, access_date, day_number, val]
+        for access_date, day_number, val in days
+    )
+    return address
+
+# -------------------------------------------------------------------------------------------
+# DATABASE PARSING
+# -------------------------------------------------------------------------------------------
+
+def find_tables(esedb_file):
+    """
+    Returns {table name: table number} for the UAL tables (Table_Dict) of an open database.
+    """
+    table_numbers = {}
+    for i in range(esedb_file.get_number_of_tables()):
+        tname = esedb_file.get_table(i).get_name()
+        if tname in Table_Dict:
+            table_numbers[Table_Dict[tname]] = i
+    return table_numbers
+
+def read_ual_correlations(path_to_esedb):
+    """
+    Reads the (address, hostname) pairs the correlation index keeps from the DNS table of one
+    database; the (address, role name) pairs are collected while parsing the CLIENTS table.
+    Runs in a worker process; returns (path, dns_pairs, error message or None).
+    """
+    dns_pairs = set()
+    try:
+        with open(path_to_esedb, "rb") as file_object:
+            esedb_file = pyesedb.file()
+            esedb_file.open_file_object(file_object)
+            try:
+                table_numbers = find_tables(esedb_file)
+                if "DNS" in table_numbers:
+                    for record in iter_dns_records(esedb_file.get_table(table_numbers["DNS"])):
+                        dns_pairs.add((record.address, record.hostname))
+            finally:
+                esedb_file.close()
+    except Exception as e:
+        return path_to_esedb, [], str(e)
+    return path_to_esedb, sorted(dns_pairs), None
 
+def parse_single_esedb(path_to_esedb, clients_sink, days_sink, source_name, ual_index=None):
+    """
+    Parses a SINGLE .mdb file: writes one row per CLIENTS record to clients_sink and one row
+    per day of access to days_sink (ResultSinks), tagged with source_name.
+    Addresses are enriched from ual_index (a UalIndex over the whole collection) if given,
+    else from the DNS table of this database alone.
+    All state is local, so several databases can be parsed at once in separate processes.
+    Returns the set of (address, role name) pairs of the CLIENTS table for the correlation
+    index, or None if the file could not be opened.
+    """
+    start_time = time.time()
     try:
         file_object = open(path_to_esedb, "rb")
     except Exception as e:
         sys.stderr.write(f"Error opening file {path_to_esedb}: {e}\n")
-        return
+        return None
+
+    with file_object:
+        esedb_file = pyesedb.file()
+        esedb_file.open_file_object(file_object)
+        try:
+            role_pairs = _parse_tables(esedb_file, path_to_esedb, clients_sink, days_sink, source_name, ual_index)
+        finally:
+            esedb_file.close()
+
+    scriptruntime = time.time() - start_time
+    formattedscriptruntime = int(scriptruntime)
+    if formattedscriptruntime > 60:
+        totalruntime = str(timedelta(seconds=int(formattedscriptruntime)))
+        sys.stderr.write(f"KStrike processed '{path_to_esedb}' in {totalruntime} (H:MM:SS)\n")
+    else:
+        sys.stderr.write(f"KStrike processed '{path_to_esedb}' in {formattedscriptruntime} seconds\n")
+    return role_pairs
 
-    esedb_file = pyesedb.file()
-    esedb_file.open_file_object(file_object)
+def _parse_tables(esedb_file, path_to_esedb, clients_sink, days_sink, source_name, ual_index):
     Num_Of_tables = esedb_file.get_number_of_tables()
     sys.stderr.write(f"Parsing '{path_to_esedb}'. Number of tables: {Num_Of_tables}\n")
 
     # Identify table numbers
-    for i in range(Num_Of_tables):
-        Table = esedb_file.get_table(i)
-        tname = Table.get_name()
-        if tname in Table_Dict:
-            Table_lookup_name = Table_Dict[tname]
-            sys.stderr.write(f"Table {i} = {Table_lookup_name}\n")
-            if Table_lookup_name == "DNS":
-                dnstablenumber = i
-            elif Table_lookup_name == "CLIENTS":
-                clienttablenumber = i
-
-    # --- Parse the DNS table ---
-    if dnstablenumber is not None:
-        DNSTable = esedb_file.get_table(dnstablenumber)
-        Table_name = Table_Dict[DNSTable.get_name()]
-        Table_Num_Records = DNSTable.get_number_of_records()
-        Table_Num_Columns = DNSTable.get_number_of_columns()
-
-        if Table_Num_Records > 0 and Table_name == "DNS":
-            for t in range(Table_Num_Records):
-                Table_Record = DNSTable.get_record(t)
-                for x in range(Table_Num_Columns):
-                    Column_Name = Table_Record.get_column_name(x)
-                    Column_Type = Table_Record.get_column_type(x)
-                    Data_Value = []
-                    Check_Column_Type(Table_Record, Column_Type, x, Data_Value, Table_name)
-        else:
+    table_numbers = find_tables(esedb_file)
+    for Table_lookup_name, i in sorted(table_numbers.items(), key=lambda item: item[1]):
+        sys.stderr.write(f"Table {i} = {Table_lookup_name}\n")
+
+    # --- Hostnames: the collection-wide index, or the DNS table of this database ---
+    if ual_index is not None:
+        resolve_hostnames = ual_index.hostnames
+    elif "DNS" in table_numbers:
+        DNSTable = esedb_file.get_table(table_numbers["DNS"])
+        if DNSTable.get_number_of_records() == 0:
             sys.stderr.write(f"No DNS records found in '{path_to_esedb}'.\n")
+        resolve_hostnames = build_dns_map(iter_dns_records(DNSTable)).get
     else:
         sys.stderr.write("No DNS table found.\n")
-
-    # --- Parse the CLIENTS table ---
-    if clienttablenumber is not None:
-        ClientsTable = esedb_file.get_table(clienttablenumber)
-        Table_name = Table_Dict[ClientsTable.get_name()]
-        Table_Num_Records = ClientsTable.get_number_of_records()
-        Table_Num_Columns = ClientsTable.get_number_of_columns()
-
-        if Table_Num_Records > 0 and Table_name == "CLIENTS":
-            # Print the header line
-            sys.stdout.write(
-                "RoleGuid (RoleName)||TenantId||TotalAccesses||InsertDate||LastAccess||"
-                "RawAddress||ConvertedAddress (Correlated_HostName(s))||AuthenticatedUserName||"
-                "DatesAndAccesses||\n"
-            )
-
-            for t in range(Table_Num_Records):
-                Table_Record = ClientsTable.get_record(t)
-                badyeardetector = "No"
-                correlatedtwoaccessmismatchyear = "No"
-
-                for x in range(Table_Num_Columns):
-                    Column_Name = Table_Record.get_column_name(x)
-                    Column_Type = Table_Record.get_column_type(x)
-                    Data_Value = []
-                    Check_Column_Type(Table_Record, Column_Type, x, Data_Value, Table_name)
-
-                sys.stdout.write("||\n")
+        resolve_hostnames = {}.get
+
+    # --- Parse the CLIENTS table, collecting the role correlations on the way ---
+    role_pairs = set()
+    if "CLIENTS" in table_numbers:
+        ClientsTable = esedb_file.get_table(table_numbers["CLIENTS"])
+        if ClientsTable.get_number_of_records() > 0:
+            for record in iter_client_records(ClientsTable):
+                address = write_client_record(record, resolve_hostnames, source_name, clients_sink, days_sink)
+                if address is not None and record.role_guid is not None:
+                    role_pairs.add((address, GUID_Dict.get(record.role_guid, record.role_guid)))
         else:
             sys.stderr.write(f"No CLIENTS records found in '{path_to_esedb}'.\n")
     else:
         sys.stderr.write("No CLIENTS table found.\n")
+    return role_pairs
 
-    esedb_file.close()
+def find_mdb_files(input_dir):
+    """
+    Returns (path, output name) for every .mdb file under input_dir, subfolders included.
+    A collection usually holds one folder per server with the same file names in each
+    (Current.mdb, {GUID}.mdb), so the output name is built from the relative path.
+    """
+    mdb_files = []
+    for full_mdb_path in sorted(iter_input_files(input_dir)):
+        if full_mdb_path.lower().endswith(".mdb"):
+            relative_path = os.path.relpath(full_mdb_path, input_dir)
+            base_name = os.path.splitext(relative_path)[0].replace(os.sep, '_')
+            mdb_files.append((full_mdb_path, f"{base_name}_kstrike"))
+    return mdb_files
+
+def parse_mdb_task(task):
+    """
+    Parses one database into its own CLIENTS and access-days outputs; runs in a worker process.
+    Returns (path, role_pairs, error message or None), role_pairs being sorted (address, role
+    name) pairs, or None if the database was not parsed.
+    """
+    full_mdb_path, source_name, clients_path, days_path, index_path = task
+    parquet = clients_path.lower().endswith('.parquet')
+    try:
+        with UalIndex(index_path) as ual_index, \
+                ResultSink(clients_path, CLIENTS_HEADER, schema=clients_schema() if parquet else None) as clients_sink, \
+                ResultSink(days_path, ACCESS_DAYS_HEADER, schema=access_days_schema() if parquet else None) as days_sink:
+            role_pairs = parse_single_esedb(full_mdb_path, clients_sink, days_sink, source_name, ual_index)
+    except Exception as e:
+        return full_mdb_path, None, str(e)
+    return full_mdb_path, sorted(role_pairs) if role_pairs is not None else None, None
 
-    scriptruntime = time.time() - StartTime
-    formattedscriptruntime = int(scriptruntime)
-    if formattedscriptruntime > 60:
-        import datetime
-        totalruntime = str(datetime.timedelta(seconds=int(formattedscriptruntime)))
-        sys.stderr.write(f"KStrike processed in {totalruntime} (H:MM:SS)\n")
-    else:
-        sys.stderr.write(f"KStrike processed in {formattedscriptruntime} seconds\n")
+def _run_tasks(pool, function, tasks):
+    # Databases differ a lot in size, so each result is handled as soon as it is done
+    if pool:
+        return pool.imap_unordered(function, tasks)
+    return map(function, tasks)
 
-def parse_all_mdb_in_input():
+def parse_all_mdb_in_input(output_format='csv', workers=DEFAULT_WORKERS):
     """
-    Loops through all *.mdb files in _input (based on get_toolkit_dirs()),
-    and writes the KStrike output to _output/<basename>_kstrike.txt.
+    Parses all *.mdb files under _input (based on get_toolkit_dirs()) across a pool of
+    `workers` processes. Each database gets two tables in the chosen format:
+    _output/<relative path>_kstrike (one row per CLIENTS record) and
+    _output/<relative path>_kstrike_days (one row per day of access).
+
+    First the DNS correlations of new or changed databases are read into the UAL correlation
+    index (tmp/ual_index.sqlite). Every parse then resolves hostnames from the whole
+    collection, so names seen only in older {GUID}.mdb archives still enrich the records of
+    Current.mdb, and the (address, role) correlations collected while reading each CLIENTS
+    table are stored in the index as the databases finish.
     """
     dirs = get_toolkit_dirs()
     input_dir = dirs['input_dir']
@@ -450,36 +620,63 @@ def parse_all_mdb_in_input():
     # Ensure _output directory exists
     os.makedirs(output_dir, exist_ok=True)
 
-    # List all .mdb files in _input
-    mdb_files = [f for f in os.listdir(input_dir) if f.lower().endswith(".mdb")]
+    mdb_files = find_mdb_files(input_dir)
     if not mdb_files:
         sys.stderr.write(f"No .mdb files found in '{input_dir}'. Nothing to parse.\n")
         return
 
-    for mdb_file in mdb_files:
-        full_mdb_path = os.path.join(input_dir, mdb_file)
-        base_name, _ = os.path.splitext(mdb_file)
-        out_file_path = os.path.join(output_dir, f"{base_name}_kstrike.txt")
+    index_path = get_ual_index_path()
+    mdb_paths = [full_mdb_path for full_mdb_path, _ in mdb_files]
+    stale = stale_databases(mdb_paths, index_path)
+
+    tasks = []
+    for full_mdb_path, output_name in mdb_files:
+        source_name = os.path.relpath(full_mdb_path, input_dir)
+        clients_path = build_output_path(output_dir, output_name, output_format)
+        days_path = build_output_path(output_dir, f"{output_name}_days", output_format)
+        sys.stderr.write(f"Queued: {source_name} => {clients_path}\n")
+        tasks.append((full_mdb_path, source_name, clients_path, days_path, index_path))
+
+    workers = min(workers or 1, len(tasks))
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers)
+
+    def indexed_correlations():
+        for full_mdb_path, dns_pairs, error in _run_tasks(pool, read_ual_correlations, stale):
+            mdb_file = os.path.relpath(full_mdb_path, input_dir)
+            if error:
+                sys.stderr.write(f"Failed indexing {mdb_file}: {error}\n")
+                continue
+            sys.stderr.write(f"Indexed: {mdb_file} ({len(dns_pairs)} DNS names)\n")
+            yield full_mdb_path, dns_pairs, None
+
+    def parsed_correlations():
+        for full_mdb_path, role_pairs, error in _run_tasks(pool, parse_mdb_task, tasks):
+            mdb_file = os.path.relpath(full_mdb_path, input_dir)
+            if error:
+                sys.stderr.write(f"Failed parsing {mdb_file}: {error}\n")
+                continue
+            sys.stderr.write(f"Finished: {mdb_file}\n")
+            if role_pairs is not None:
+                yield full_mdb_path, None, role_pairs
 
-        sys.stderr.write(f"\n--- Parsing: {mdb_file} ---\n")
-        sys.stderr.write(f"Output => {out_file_path}\n")
-
-        # Redirect stdout to a file for this parse, so user sees the final KStrike output in .txt
-        original_stdout = sys.stdout
-        try:
-            with open(out_file_path, 'w', encoding='utf-8') as out_f:
-                sys.stdout = out_f
-                parse_single_esedb(full_mdb_path)
-        except Exception as e:
-            sys.stderr.write(f"Failed parsing {mdb_file}: {e}\n")
-        finally:
-            sys.stdout = original_stdout
-
-        sys.stderr.write(f"Finished: {mdb_file}\n")
+    try:
+        update_ual_index(input_dir, indexed_correlations(), keep_paths=mdb_paths, index_path=index_path)
+        update_ual_index(input_dir, parsed_correlations(), index_path=index_path)
+    except BaseException:
+        if pool:
+            pool.terminate()
+        raise
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
 
 def main():
-    # Just parse everything, no user prompts
-    parse_all_mdb_in_input()
+    # Parse everything; the output format is the only prompt
+    output_format = prompt_output_format()
+    parse_all_mdb_in_input(output_format)
 
 if __name__ == "__main__":
     main()
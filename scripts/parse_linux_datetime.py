@@ -3,39 +3,237 @@ Note: EXPERIMENTAL: Parses linux logs for timestamps and prints the matching lin
 """
 
 import os
-import re
-import pandas as pd
+import csv
+import heapq
+import shutil
+import hashlib
+import tempfile
+import multiprocessing
 from datetime import datetime
 from common_paths import get_toolkit_dirs
+from common_output import ResultSink, build_output_path, prompt_output_format
+from common_timestamps import find_timestamp_candidates, resolve_timestamps
+from common_scan import DEFAULT_WORKERS, ARCHIVE_SEPARATOR, iter_input_sources, plan_file_ranges, iter_range_lines
 
-def process_log_entry(timestamp_string, line, line_number, current_year, relative_path, channel):
-    if line.strip() not in processed_payloads:
-        timestamp = None
-        formats_to_try = [
-            ('%Y %b %d %H:%M:%S', f"{current_year} {timestamp_string}"),
-            ('%Y %b %d %H:%M:%S.%f', f"{current_year} {timestamp_string}"),
-            ('%Y-%m-%d %H:%M:%S', timestamp_string),
-            ('%d/%b/%Y:%H:%M:%S', timestamp_string)
-        ]
-
-        for format_str, formatted_ts_str in formats_to_try:
-            try:
-                timestamp = datetime.strptime(formatted_ts_str, format_str)
-                break
-            except ValueError:
-                pass
+HEADER = ['Time Generated', 'Filename', 'Line', 'Channel', 'Payload']
 
+# Lines with timestamp candidates collected before their candidates are converted in bulk
+BATCH_LINES = 10000
+
+# Memory all workers together use for rows sorted in memory before being spilled to a run
+# file; each worker spills at its share of it. A row costs its payload plus about ROW_OVERHEAD
+# bytes of Python objects
+RUN_MEMORY_BYTES = 512 * 1024 * 1024
+ROW_OVERHEAD = 256
+
+# Most run files merged at once; more are first merged in groups of this size
+MERGE_FAN_IN = 256
+
+# Rows per Parquet row group. The timeline is written in time order, so each row group covers
+# a narrow time range and its min/max statistics let time-window filters skip the rest
+PARQUET_ROW_GROUP_ROWS = 128 * 1024
+
+def timeline_schema():
+    """
+    Returns the Parquet schema of the timeline: a native timestamp column, dictionary-encoded
+    Filename and Channel (few distinct values over many rows) and an integer line number.
+    """
+    import pyarrow as pa
+
+    return pa.schema([
+        ('Time Generated', pa.timestamp('s')),
+        ('Filename', pa.dictionary(pa.int32(), pa.string())),
+        ('Line', pa.int64()),
+        ('Channel', pa.dictionary(pa.int32(), pa.string())),
+        ('Payload', pa.string()),
+    ])
+
+def payload_digest(payload):
+    """
+    Returns a 64-bit digest of a payload. Seen payloads are tracked by digest instead of by the
+    full string, so the dedup set costs a small fixed amount per distinct line.
+    """
+    digest = hashlib.blake2b(payload.encode('utf-8', 'replace'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+def parse_log_file(current_file, relative_path, channel, current_year):
+    """
+    Yields one [Time Generated, Filename, Line, Channel, Payload] row per line of a log source
+    whose first parseable timestamp is found. Repeated payloads are only skipped within a batch;
+    the merge drops the remaining repeats, remembering one timestamp's digests at a time.
+    """
+    batch = []
+    # Identical payloads have identical candidates, so repeats within a batch are resolved once
+    pending = set()
+    for line_number, line in enumerate(iter_range_lines(current_file), start=1):
+        payload = line.strip()
+        digest = payload_digest(payload)
+        if digest in pending:
+            continue
+
+        candidates = find_timestamp_candidates(line)
+        if candidates:
+            pending.add(digest)
+            batch.append((line_number, payload, candidates))
+            if len(batch) >= BATCH_LINES:
+                yield from _resolve_batch(batch, relative_path, channel, current_year)
+                batch = []
+                pending = set()
+    yield from _resolve_batch(batch, relative_path, channel, current_year)
+
+def _resolve_batch(batch, relative_path, channel, current_year):
+    timestamps = resolve_timestamps([candidates for _, _, candidates in batch], current_year)
+    for (line_number, payload, _), timestamp in zip(batch, timestamps):
         if timestamp:
-            timestamps.append({
-                'Time Generated': timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                'Filename': relative_path,
-                'Line': line_number,
-                'Channel': channel,
-                'Payload': line.strip()
-            })
-            processed_payloads.add(line.strip())
-            print(f"Processed timestamp {timestamp.strftime('%Y-%m-%d %H:%M:%S')} "
-                  f"in file {relative_path} (Line {line_number})")
+            yield [timestamp, relative_path, line_number, channel, payload]
+
+def _spill_run(rows, source_index, run_dir):
+    """
+    Sorts the rows of one source by time and line number and writes them to a new run file,
+    each prefixed with the source index; returns the run file's path.
+    """
+    rows.sort(key=lambda row: (row[0], row[2]))
+    run_fd, run_path = tempfile.mkstemp(suffix='.csv', dir=run_dir)
+    with os.fdopen(run_fd, 'w', encoding='utf-8', newline='') as run_file:
+        csv.writer(run_file).writerows([source_index, *row] for row in rows)
+    return run_path
+
+def _iter_run(run_path):
+    """
+    Yields (merge_key, source_index, row) for the rows of a run file. Ties on the timestamp are
+    broken by the order the sources were discovered in and then by line number.
+    """
+    with open(run_path, 'r', encoding='utf-8', newline='') as run_file:
+        for source_index, *row in csv.reader(run_file):
+            source_index = int(source_index)
+            row[2] = int(row[2])
+            yield (row[0], source_index, row[2]), source_index, row
+
+def _parse_source_task(task):
+    """
+    Parses one log source in a worker and spills its rows as time-sorted runs of about
+    run_bytes each. Returns (source_index, run_paths, error).
+    """
+    source_index, current_file, relative_path, channel, current_year, run_dir, run_bytes = task
+    run_paths = []
+    rows = []
+    rows_bytes = 0
+    error = None
+    try:
+        # Repeats are dropped when merging, so memory does not grow with the source
+        for row in parse_log_file(current_file, relative_path, channel, current_year):
+            rows.append(row)
+            rows_bytes += len(row[4]) + ROW_OVERHEAD
+            if rows_bytes >= run_bytes:
+                run_paths.append(_spill_run(rows, source_index, run_dir))
+                rows = []
+                rows_bytes = 0
+    except Exception as e:
+        error = str(e)
+    if rows:
+        run_paths.append(_spill_run(rows, source_index, run_dir))
+    return source_index, run_paths, error
+
+def _reduce_runs(run_paths, run_dir):
+    """
+    Merges run files in groups until at most MERGE_FAN_IN are left, so the final merge never
+    holds more files open than that. Returns the remaining run paths.
+    """
+    while len(run_paths) > MERGE_FAN_IN:
+        merged = []
+        for group_start in range(0, len(run_paths), MERGE_FAN_IN):
+            group = run_paths[group_start:group_start + MERGE_FAN_IN]
+            run_fd, run_path = tempfile.mkstemp(suffix='.csv', dir=run_dir)
+            with os.fdopen(run_fd, 'w', encoding='utf-8', newline='') as run_file:
+                csv.writer(run_file).writerows(
+                    [source_index, *row] for _, source_index, row in heapq.merge(*map(_iter_run, group))
+                )
+            for path in group:
+                os.remove(path)
+            merged.append(run_path)
+        run_paths = merged
+    return run_paths
+
+def parse_linux_datetimes(input_directory, output_file, current_year=None, workers=DEFAULT_WORKERS):
+    """
+    Parses every log source under input_directory (compressed files and zip members included)
+    and writes one chronologically ordered timeline to output_file (CSV, JSONL or Parquet by
+    extension; Parquet is typed, see timeline_schema).
+
+    Sources are parsed across a pool of `workers` processes; each worker spills its rows as
+    time-sorted runs to a temporary directory under tmp once its share of RUN_MEMORY_BYTES is
+    used, and the runs are merged with a streaming k-way merge, so memory use does not grow
+    with the size of the logs or the number of workers.
+    A payload seen in several sources is kept once, at its first source in discovery order.
+    Returns the number of rows written.
+    """
+    current_year = current_year or datetime.now().year
+    tmp_dir = get_toolkit_dirs()['tmp_dir']
+    os.makedirs(tmp_dir, exist_ok=True)
+    run_dir = tempfile.mkdtemp(prefix='linux-datetime-', dir=tmp_dir)
+
+    sources = []
+    # Compressed logs (syslog.2.gz) and zip members (<archive>!<member>) are read as streams
+    for current_file in iter_input_sources(input_directory):
+        relative_path = os.path.relpath(current_file, input_directory)
+        file = os.path.basename(current_file.split(ARCHIVE_SEPARATOR)[-1])
+        channel = os.path.splitext(file)[0].split('.')[0]
+        if not plan_file_ranges(current_file):
+            continue
+        sources.append((current_file, relative_path, channel))
+    relative_paths = [relative_path for _, relative_path, _ in sources]
+
+    workers = min(workers or 1, len(sources))
+    # The in-memory budget is shared by the workers, so their total stays bounded
+    run_bytes = RUN_MEMORY_BYTES // max(workers, 1)
+    tasks = [
+        (source_index, current_file, relative_path, channel, current_year, run_dir, run_bytes)
+        for source_index, (current_file, relative_path, channel) in enumerate(sources)
+    ]
+    pool = None
+    total = 0
+    try:
+        if workers > 1:
+            pool = multiprocessing.Pool(workers)
+            results = pool.imap(_parse_source_task, tasks)
+        else:
+            results = map(_parse_source_task, tasks)
+
+        run_paths = []
+        for source_index, source_runs, error in results:
+            print(f"Processing file: {relative_paths[source_index]}")
+            if error:
+                print(f"Error processing file {relative_paths[source_index]}: {error}")
+            run_paths.extend(source_runs)
+
+        schema = row_group_size = None
+        if output_file.lower().endswith('.parquet'):
+            schema, row_group_size = timeline_schema(), PARQUET_ROW_GROUP_ROWS
+        with ResultSink(output_file, HEADER, schema=schema, row_group_size=row_group_size) as sink:
+            # A repeated payload has the same timestamp wherever it appears, so its copies meet
+            # within one timestamp and only that timestamp's digests need to be remembered
+            current_timestamp = None
+            seen_payloads = set()
+            for _, _, row in heapq.merge(*map(_iter_run, _reduce_runs(run_paths, run_dir))):
+                if row[0] != current_timestamp:
+                    current_timestamp = row[0]
+                    seen_payloads = set()
+                digest = payload_digest(row[4])
+                if digest in seen_payloads:
+                    continue
+                seen_payloads.add(digest)
+                sink.write_row(row)
+                total += 1
+    except BaseException:
+        if pool:
+            pool.terminate()
+        raise
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        shutil.rmtree(run_dir, ignore_errors=True)
+    return total
 
 if __name__ == "__main__":
     # Common_paths
@@ -43,45 +241,13 @@ if __name__ == "__main__":
     default_input_directory = dirs['input_dir']
     default_output_directory = dirs['output_dir']
 
+    output_format = prompt_output_format()
+
     # Output_file variable
-    output_filename = datetime.now().strftime("%Y%m%d%H%M%S_linux-log-datetime.csv")
-    output_file = os.path.join(default_output_directory, output_filename)
-
-    current_year = datetime.now().year
-    timestamps = []
-    processed_payloads = set()
-
-    patterns = [
-        r'(\w{3} \d{1,2} \d{2}:\d{2}:\d{2})',
-        r'(\w{3} \d{1,2} \d{2}:\d{2}:\d{2}\.\d{6})',
-        r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})',
-        r'(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2})'
-    ]
+    current_datetime = datetime.now().strftime("%Y%m%d%H%M%S")
+    output_file = build_output_path(default_output_directory, f"{current_datetime}_linux-log-datetime", output_format)
 
     print(f"Searching for log files in {default_input_directory} (and subdirectories)...")
 
-    for root, _, files in os.walk(default_input_directory):
-        for file in files:
-            current_file = os.path.join(root, file)
-            relative_path = os.path.relpath(current_file, default_input_directory)
-            channel = os.path.splitext(file)[0].split('.')[0]
-
-            try:
-                with open(current_file, 'r', encoding='unicode_escape') as reader:
-                    line_number = 1
-                    for line in reader:
-                        for pattern in patterns:
-                            matches = re.finditer(pattern, line)
-                            for match in matches:
-                                timestamp_string = match.group(1)
-                                process_log_entry(
-                                    timestamp_string, line, line_number,
-                                    current_year, relative_path, channel
-                                )
-                        line_number += 1
-            except Exception as e:
-                print(f"Error processing file {relative_path}: {str(e)}")
-
-    df = pd.DataFrame(timestamps)
-    df.to_csv(output_file, index=False)
-    print(f"Processing completed. Total timestamps processed: {len(timestamps)}")
+    total = parse_linux_datetimes(default_input_directory, output_file)
+    print(f"Processing completed. Total timestamps processed: {total}")
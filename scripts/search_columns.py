@@ -0,0 +1,168 @@
+import csv
+import io
+from bisect import bisect_right
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from common_paths import get_toolkit_dirs
+from common_output import ResultSink, build_output_path, prompt_output_format
+from common_scan import DEFAULT_WORKERS, ARCHIVE_SEPARATOR, iter_input_sources, open_source, scan_input
+from common_cache import ResultCache
+
+# Rows per record batch when reading CSV and Parquet files
+BATCH_ROWS = 64 * 1024
+CSV_BLOCK_SIZE = 16 * 1024 * 1024
+
+_COMPRESSED_SUFFIXES = ('.gz', '.bz2', '.xz')
+
+def table_format(source):
+    """
+    Returns 'csv' or 'parquet' for tabular sources (compressed CSVs included), else None.
+    """
+    name = source.split(ARCHIVE_SEPARATOR)[-1].lower()
+    if name.endswith('.parquet'):
+        return 'parquet' if ARCHIVE_SEPARATOR not in source else None
+    for suffix in _COMPRESSED_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return 'csv' if name.endswith('.csv') else None
+
+def _is_text(arrow_type):
+    return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+
+def _csv_header(source):
+    with open_source(source) as file:
+        reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', errors='replace', newline=''))
+        return next(reader, [])
+
+def iter_record_batches(source, columns=None, skipped_rows=None):
+    """
+    Yields the record batches of a CSV or Parquet source, reading only `columns` (all text
+    columns if None). CSV columns are read as strings, so types never change between batches.
+    CSV rows with the wrong number of fields are skipped and their row numbers appended to
+    `skipped_rows` (a list); without it they fail the read.
+    """
+    if table_format(source) == 'parquet':
+        parquet_file = pq.ParquetFile(source)
+        schema = parquet_file.schema_arrow
+        if columns is None:
+            selected = [field.name for field in schema if _is_text(field.type)]
+        else:
+            selected = [field.name for field in schema if field.name in columns]
+        if not selected:
+            return
+        for batch in parquet_file.iter_batches(batch_size=BATCH_ROWS, columns=selected):
+            yield batch
+        return
+
+    names = _csv_header(source)
+    selected = [name for name in names if columns is None or name in columns]
+    if not selected:
+        return
+    parse_options = None
+    if skipped_rows is not None:
+        def skip_row(row):
+            skipped_rows.append(row.number)
+            return 'skip'
+        parse_options = pa_csv.ParseOptions(invalid_row_handler=skip_row)
+    with open_source(source) as file:
+        reader = pa_csv.open_csv(
+            file,
+            read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+            parse_options=parse_options,
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=selected,
+                column_types={name: pa.string() for name in selected},
+                strings_can_be_null=False,
+            ),
+        )
+        for batch in reader:
+            yield batch
+
+def _source_row_number(parsed_row, skipped_rows):
+    """
+    Returns the row number of the parsed_row-th (1-based) row that was kept, given the sorted
+    row numbers of the rows that were skipped before it.
+    """
+    row_number = parsed_row
+    while True:
+        shifted = parsed_row + bisect_right(skipped_rows, row_number)
+        if shifted == row_number:
+            return row_number
+        row_number = shifted
+
+def search_table(file_path, search_query, columns=None, start=0, end=None):
+    """
+    Searches the given columns of a CSV or Parquet file (all string columns if columns is None)
+    for the query, case-insensitively, with Arrow compute kernels on whole record batches.
+    Returns (rows, 0, complete) with one [source_file, source_row_number, matched_column,
+    matched_value] row per matching cell, and complete False if the file could not be read in
+    full. Row numbers count the header, so for CSV files without multi-line fields they equal the
+    line number. Malformed CSV rows (wrong number of fields) are skipped and counted.
+    """
+    rows = []
+    complete = True
+    skipped_rows = []
+    try:
+        row_offset = 1 if table_format(file_path) == 'csv' else 0
+        for batch in iter_record_batches(file_path, columns, skipped_rows):
+            for name, column in zip(batch.schema.names, batch.columns):
+                if not _is_text(column.type):
+                    column = pc.cast(column, pa.string())
+                mask = pc.match_substring(column, search_query, ignore_case=True)
+                hits = pc.indices_nonzero(pc.fill_null(mask, False))
+                if len(hits) == 0:
+                    continue
+                values = pc.take(column, hits).to_pylist()
+                for index, value in zip(hits.to_pylist(), values):
+                    rows.append([file_path, row_offset + index + 1, name, value])
+            row_offset += batch.num_rows
+    except Exception as e:
+        print(f"An error occurred while processing {file_path}: {e}")
+        complete = False
+    if skipped_rows:
+        print(f"Skipped {len(skipped_rows)} malformed rows in {file_path}")
+        skipped_rows.sort()
+        for row in rows:
+            row[1] = _source_row_number(row[1], skipped_rows)
+    rows.sort(key=lambda row: row[1])
+    return rows, 0, complete
+
+def column_search(file_path, search_query, columns=None, output_file=None, workers=DEFAULT_WORKERS):
+    """
+    Runs search_table over every CSV and Parquet file under the given path (file or directory),
+    one file per task across `workers` processes, and writes the matches to the output file.
+    """
+    sink = None
+    try:
+        if output_file:
+            sink = ResultSink(output_file, ['source_file', 'source_row_number', 'matched_column', 'matched_value'])
+
+        tasks = [(source, 0, None, None) for source in iter_input_sources(file_path) if table_format(source)]
+        cache = ResultCache('columns', [search_query, sorted(columns) if columns else None])
+        scan_input(file_path, search_table, (search_query, columns), sink, workers, tasks=tasks, cache=cache)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    finally:
+        if sink:
+            sink.close()
+
+if __name__ == "__main__":
+    dirs = get_toolkit_dirs()
+    default_input_directory = dirs['input_dir']
+    default_output_directory = dirs['output_dir']
+
+    search_query = input('Please enter the search query: ')
+    columns_input = input('Columns to search, comma-separated (e.g. PayloadData1,ExecutableInfo; Enter for all text columns): ')
+    columns = [column.strip() for column in columns_input.split(',') if column.strip()] or None
+    output_format = prompt_output_format()
+
+    current_datetime = datetime.now().strftime("%Y%m%d%H%M%S")
+    output_file = build_output_path(default_output_directory, f"{current_datetime}_columns", output_format)
+
+    column_search(default_input_directory, search_query, columns, output_file)
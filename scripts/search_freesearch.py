@@ -1,52 +1,147 @@
 import os
-import csv
+import mmap
 from datetime import datetime
 
 # Import from common_paths.py
 from common_paths import get_toolkit_dirs
+from common_output import ResultSink, build_output_path, prompt_output_format
+from common_scan import (
+    DEFAULT_WORKERS, SPLITTABLE_ENCODINGS, scan_input, sniff_encoding, is_plain_file,
+    iter_range_lines, count_range_lines
+)
+from common_index import plan_indexed_ranges
+from common_cache import ResultCache, prompt_cache_mode
 
-def freetext(file_path, search_query, output_csv=None):
+def freetext(file_path, search_query, output_file=None, workers=DEFAULT_WORKERS,
+             use_cache=False, content_hash=False):
     """
     Performs a free-text search on the given file path (which can be a file or directory).
-    Optionally writes matching lines to a CSV file.
+    Optionally writes matching lines to an output file (CSV, JSONL or Parquet).
+    Files, and byte ranges of large files, are scanned in parallel across `workers` processes.
+    If a trigram index exists in tmp/, only the blocks that can contain the query are scanned.
+    Ad-hoc queries are rarely repeated, so results are only cached per file with use_cache;
+    content_hash then fingerprints files by content instead of size and modification time.
     """
+    sink = None
     try:
-        # Create CSV with header
-        if output_csv:
-            with open(output_csv, 'w', newline='', encoding='utf-8') as csv_file:
-                csv_writer = csv.writer(csv_file)
-                csv_writer.writerow(['source_file', 'source_row_number', 'source_data'])
-
-        # Recursively search in files
-        if os.path.isdir(file_path):
-            for root, _, files in os.walk(file_path):
-                for file_name in files:
-                    file_to_search = os.path.join(root, file_name)
-                    print(f"Processing file: {file_to_search}")
-                    search_in_single_file(file_to_search, search_query, output_csv)
-        elif os.path.isfile(file_path):
-            print(f"Processing file: {file_path}")
-            search_in_single_file(file_path, search_query, output_csv)
-        else:
-            print("Invalid path provided.")
+        # Open the output once for the whole run
+        if output_file:
+            sink = ResultSink(output_file, ['source_file', 'source_row_number', 'source_data'])
+
+        # Recursively search in files, or only in the candidate blocks of the index
+        tasks = plan_indexed_ranges(file_path, [[search_query]])
+        cache = ResultCache('freetext', [search_query], content_hash=content_hash) if use_cache else None
+        scan_input(file_path, search_in_single_file, (search_query,), sink, workers,
+                   line_column=1, tasks=tasks, cache=cache)
     except Exception as e:
         print(f"An error occurred: {e}")
+    finally:
+        if sink:
+            sink.close()
+
+# The mapped buffer is lower-cased, searched and newline-counted in slices of this size
+SCAN_STEP = 16 * 1024 * 1024
 
-def search_in_single_file(file_path, search_query, output_csv=None):
+def search_in_single_file(file_path, search_query, start=0, end=None):
     """
-    Searches for the given query string in a single file.
-    If output_csv is specified, appends matching lines to that CSV file.
+    Searches for the given query string in a single file, or in its byte range [start, end).
+    Returns (rows, line_count, complete): matching lines as [source_file, source_row_number, source_data]
+    rows, with line numbers counted from `start`, the number of lines in the range, and whether
+    the range was read to the end (False after an error).
+    ASCII queries on uncompressed UTF-8 files take the memory-mapped fast path; other queries,
+    UTF-16 files, compressed files and zip members are matched line by line.
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line_number, line in enumerate(file, start=1):
-                if search_query.lower() in line.lower():
-                    if output_csv:
-                        with open(output_csv, 'a', newline='', encoding='utf-8') as csv_file:
-                            csv_writer = csv.writer(csv_file)
-                            csv_writer.writerow([file_path, line_number, line.strip()])
+        encoding = sniff_encoding(file_path) or 'utf-8'
+        mappable = encoding in SPLITTABLE_ENCODINGS and is_plain_file(file_path)
+    except Exception as e:
+        print(f"An error occurred while processing {file_path}: {e}")
+        return [], count_range_lines(file_path, start, end), False
+
+    if search_query.isascii() and mappable:
+        try:
+            return (*search_mapped_file(file_path, search_query, start, end), True)
+        except Exception as e:
+            print(f"An error occurred while processing {file_path}: {e}")
+            return [], count_range_lines(file_path, start, end), False
+
+    rows = []
+    line_number = 0
+    complete = True
+    try:
+        query = search_query.lower()
+        for line_number, line in enumerate(iter_range_lines(file_path, start, end, encoding), start=1):
+            if query in line.lower():
+                rows.append([file_path, line_number, line.strip()])
     except Exception as e:
         print(f"An error occurred while processing {file_path}: {e}")
+        line_number = count_range_lines(file_path, start, end)
+        complete = False
+    return rows, line_number, complete
+
+def search_mapped_file(file_path, search_query, start=0, end=None):
+    """
+    Fast path for ASCII queries: memory-maps the file and scans the byte range [start, end)
+    case-insensitively in large slices (bytes.lower() + find), without decoding every line.
+    Line boundaries are only worked out around actual hits, and line numbers come from
+    counting newlines in the slices.
+    Returns (rows, line_count) for search_in_single_file, which handles errors.
+    """
+    rows = []
+    with open(file_path, 'rb') as file:
+        if end is None:
+            end = os.fstat(file.fileno()).st_size
+        if end <= start:
+            return rows, 0
+
+        needle = search_query.lower().encode('ascii')
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            # line_number is 1 + the newlines in [start, counted_to)
+            line_number = 1
+            counted_to = start
+            position = start
+            block_start = start
+            while block_start < end:
+                block_end = min(block_start + SCAN_STEP, end)
+                # Overlap the next slice so hits crossing the slice boundary are not missed
+                lowered = buffer[block_start:min(block_end + max(len(needle) - 1, 0), end)].lower()
+                index = lowered.find(needle, max(position - block_start, 0))
+                while index != -1 and block_start + index < block_end:
+                    line_start = lowered.rfind(b'\n', 0, index) + 1
+                    if line_start:
+                        line_start += block_start
+                    else:
+                        # The line began in an earlier slice
+                        line_start = max(buffer.rfind(b'\n', start, block_start) + 1, start)
+                    line_end = lowered.find(b'\n', index)
+                    if line_end != -1:
+                        line_end += block_start
+                    else:
+                        line_end = buffer.find(b'\n', block_start + len(lowered), end)
+                        if line_end == -1:
+                            line_end = end
+
+                    # No newline can lie between line_start and an earlier counted_to
+                    if line_start > counted_to:
+                        line_number += lowered.count(b'\n', counted_to - block_start, line_start - block_start)
+                        counted_to = line_start
+                    # utf-8-sig drops a BOM from the first line, as iter_range_lines does
+                    encoding = 'utf-8-sig' if line_start == 0 else 'utf-8'
+                    line = buffer[line_start:line_end].decode(encoding, 'replace')
+                    rows.append([file_path, line_number, line.strip()])
+
+                    # At most one row per line, as in the line-by-line search
+                    position = line_end + 1
+                    index = lowered.find(needle, position - block_start)
+
+                line_number += lowered.count(b'\n', counted_to - block_start, block_end - block_start)
+                counted_to = block_start = block_end
+
+            # A final line without a trailing newline still counts
+            line_count = line_number - 1
+            if buffer[end - 1:end] != b'\n':
+                line_count += 1
+    return rows, line_count
 
 if __name__ == "__main__":
     # Default paths
@@ -59,11 +154,15 @@ if __name__ == "__main__":
 
     # Prompt user for search query
     _search_query = input('Please enter the search query: ')
+    _output_format = prompt_output_format()
+    _content_hash = prompt_cache_mode()
 
-    # Output CSV
+    # Output file
     current_datetime = datetime.now().strftime("%Y%m%d%H%M%S")
-    proposed_csv_name = f"{current_datetime}_freetext.csv"
-    proposed_csv_path = os.path.join(default_output_directory, proposed_csv_name)
+    proposed_output_path = build_output_path(
+        default_output_directory, f"{current_datetime}_freetext", _output_format
+    )
 
-    _output_csv = proposed_csv_path
-    freetext(_input, _search_query, _output_csv if _output_csv else None)
+    _output_file = proposed_output_path
+    freetext(_input, _search_query, _output_file if _output_file else None,
+             use_cache=_content_hash is not None, content_hash=bool(_content_hash))
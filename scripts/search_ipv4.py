@@ -1,43 +1,62 @@
 import os
-import csv
-import re
 from datetime import datetime
-from ipaddress import ip_address
 
 from common_paths import get_toolkit_dirs
+from common_ipv4 import IPV4_PATTERN, is_private_ipv4, load_cidr_watchlist
+from common_output import ResultSink, SummarySink, build_output_path, prompt_output_format, prompt_summary_mode
+from common_scan import scan_input, iter_range_lines, count_range_lines
+from common_cache import ResultCache
+from common_ual_index import UalIndex, UalEnrichedSink, get_ual_index_path
 
-def ipv4_search(file_path, output_csv=None, include_private=True):
+def ipv4_search(file_path, include_private=True, watchlist=None, start=0, end=None):
     """
-    Searches for IPv4 addresses within a file. Optionally writes matches to a CSV file if output_csv is specified.
+    Searches for IPv4 addresses within a file, or within its byte range [start, end).
+    Returns (rows, line_count, complete) with one [source_file, source_row_number, matched_ipv4,
+    source_data] row per match, line numbers counted from `start`, and complete False if the range
+    could not be read to the end.
+    With a watchlist (a CidrWatchlist), only addresses inside a watchlist range are reported and
+    the matched range is added after matched_ipv4.
     """
+    rows = []
+    line_number = 0
+    complete = True
+    # Verdict per distinct address: None to skip it, else the row fields to report
+    verdicts = {}
     try:
-        if output_csv:
-            mode = 'a' if os.path.exists(output_csv) else 'w'
-            with open(output_csv, mode, newline='', encoding='utf-8') as csv_file:
-                csv_writer = csv.writer(csv_file)
-                if mode == 'w':
-                    csv_writer.writerow(['source_file', 'source_row_number', 'matched_ipv4', 'source_data'])
-
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line_number, line in enumerate(file, start=1):
-                # Regex for IPv4
-                ipv4_addresses = re.findall(r'\b(?:\d{1,3}\.){3}\d{1,3}\b', line)
-                for ipv4_address in ipv4_addresses:
-                    ip = ip_address(ipv4_address)
+        for line_number, line in enumerate(iter_range_lines(file_path, start, end), start=1):
+            ipv4_addresses = IPV4_PATTERN.findall(line)
+            if not ipv4_addresses:
+                continue
+            source_data = None
+            for ipv4_address in ipv4_addresses:
+                try:
+                    fields = verdicts[ipv4_address]
+                except KeyError:
+                    fields = None
                     # Process if private addresses are included
-                    if include_private or not ip.is_private:
-                        # Write match to CSV if enabled
-                        if output_csv:
-                            with open(output_csv, 'a', newline='', encoding='utf-8') as csv_file:
-                                csv_writer = csv.writer(csv_file)
-                                csv_writer.writerow([file_path, line_number, ipv4_address, line.strip()])
+                    if include_private or not is_private_ipv4(ipv4_address):
+                        if watchlist is None:
+                            fields = [ipv4_address]
+                        else:
+                            cidr = watchlist.lookup(ipv4_address)
+                            if cidr is not None:
+                                fields = [ipv4_address, cidr]
+                    verdicts[ipv4_address] = fields
+                if fields is not None:
+                    if source_data is None:
+                        source_data = line.strip()
+                    rows.append([file_path, line_number, *fields, source_data])
     except Exception as e:
         print(f"An error occurred while processing {file_path}: {e}")
+        line_number = count_range_lines(file_path, start, end)
+        complete = False
+    return rows, line_number, complete
 
 if __name__ == "__main__":
     dirs = get_toolkit_dirs()
     default_input_directory = dirs['input_dir']
     default_output_directory = dirs['output_dir']
+    watchlist_file = os.path.join(dirs['base_dir'], "input_watchlist.txt")
 
     # Prompt user for RFC1918 inclusion
     while True:
@@ -48,21 +67,64 @@ if __name__ == "__main__":
         else:
             print("Invalid input. Please enter 'Y' for yes or 'N' for no.")
 
-    # Default CSV filename
+    # Prompt user for watchlist mode
+    watchlist = None
+    while True:
+        watchlist_input = input("Only report addresses in the CIDR watchlist (input_watchlist.txt)? (Y/N): ").strip().lower()
+        if watchlist_input in {'y', 'n'}:
+            break
+        print("Invalid input. Please enter 'Y' for yes or 'N' for no.")
+    if watchlist_input == 'y':
+        try:
+            watchlist = load_cidr_watchlist(watchlist_file)
+        except FileNotFoundError:
+            print(f"Watchlist file not found: {watchlist_file}")
+            exit(1)
+        print(f"Loaded {len(watchlist)} watchlist ranges.")
+
+    # Prompt user for UAL enrichment, if parse_kstrike.py has built the correlation index
+    ual_index = None
+    ual_index_path = get_ual_index_path()
+    if os.path.exists(ual_index_path):
+        while True:
+            ual_input = input("Add hostnames and roles from the KStrike UAL index? (Y/N): ").strip().lower()
+            if ual_input in {'y', 'n'}:
+                break
+            print("Invalid input. Please enter 'Y' for yes or 'N' for no.")
+        if ual_input == 'y':
+            ual_index = UalIndex(ual_index_path)
+
+    summary_samples = prompt_summary_mode()
+    output_format = prompt_output_format()
+
+    # Default output filename
     current_datetime = datetime.now().strftime("%Y%m%d%H%M%S")
-    default_output_csv = os.path.join(default_output_directory, f"{current_datetime}_ipv4_addresses.csv")
+    default_output_file = build_output_path(
+        default_output_directory, f"{current_datetime}_ipv4_addresses", output_format
+    )
 
     path = default_input_directory
-    output_csv = default_output_csv
+    output_file = default_output_file
 
-    if os.path.isdir(path):
-        for root, _, files in os.walk(path):
-            for file_name in files:
-                file_to_search = os.path.join(root, file_name)
-                print(f"Processing file: {file_to_search}")
-                ipv4_search(file_to_search, output_csv, include_private)
-    elif os.path.isfile(path):
-        print(f"Processing file: {path}")
-        ipv4_search(path, output_csv, include_private)
+    header = ['source_file', 'source_row_number', 'matched_ipv4', 'source_data']
+    if watchlist is not None:
+        header.insert(3, 'matched_cidr')
+    if ual_index is not None:
+        header[-1:-1] = UalEnrichedSink.header_fields
+
+    # Summary mode only keeps counts per (address, file) and per (address, hour)
+    if summary_samples is not None:
+        sink = SummarySink(output_file, header, 2, 0, 1, len(header) - 1, summary_samples)
+        cache = None
     else:
-        print("Invalid path provided.")
+        sink = ResultSink(output_file, header)
+        cache = ResultCache('ipv4', [include_private, watchlist.cidrs if watchlist else None])
+    # Hostnames and roles are looked up as rows are written, so cached results stay valid
+    if ual_index is not None:
+        sink = UalEnrichedSink(sink, ual_index, 2)
+
+    # Files, and byte ranges of large files, are scanned in parallel; this process writes every row
+    with sink:
+        scan_input(path, ipv4_search, (include_private, watchlist), sink, line_column=1, cache=cache)
+    if ual_index is not None:
+        ual_index.close()
@@ -1,59 +1,79 @@
 import os
-import csv
 from datetime import datetime
-import re
 
 from common_paths import get_toolkit_dirs
+from common_matchers import RegexScanner, required_literals
+from common_output import ResultSink, SummarySink, build_output_path, prompt_output_format, prompt_summary_mode
+from common_scan import DEFAULT_WORKERS, scan_input, iter_range_lines, count_range_lines
+from common_index import plan_indexed_ranges
+from common_cache import ResultCache
 
-def freetext(file_path, regex_patterns, output_csv=None):
+def freetext(file_path, regex_patterns, output_file=None, workers=DEFAULT_WORKERS, summary_samples=None):
     """
     Performs a regex-based search on the given file path (which can be a file or directory).
-    Logs matching lines to a CSV file (if specified), and prints which file is being processed.
+    Logs matching lines to an output file (if specified), and prints which file is being processed.
+    All patterns are compiled once into a RegexScanner, so each file is read only once, and each
+    pattern only runs on lines containing its required literals.
+    Files, and byte ranges of large files, are scanned in parallel across `workers` processes.
+    If a trigram index exists in tmp/, only the blocks containing the required literals of
+    some pattern are scanned.
+    With summary_samples set (a number of sample rows, possibly 0), only counts per (pattern, file)
+    and per (pattern, hour) are written; the result cache is not used in that mode.
+    A risky pattern whose search exceeds the per-line time budget is aborted and skipped for
+    the rest of the run; the quarantined patterns are listed once the scan is done.
     """
+    sink = None
     try:
-        if output_csv:
-            with open(output_csv, 'w', newline='', encoding='utf-8') as csv_file:
-                csv_writer = csv.writer(csv_file)
-                csv_writer.writerow([
-                    'regex_pattern', 'pattern_description',
-                    'source_file', 'source_row_number', 'source_data'
-                ])
+        scanner = RegexScanner(regex_patterns)
+        for pattern, risk in scanner.risky.items():
+            print(f"Warning: pattern is prone to catastrophic backtracking ({risk}): {pattern}")
+
+        header = [
+            'regex_pattern', 'pattern_description',
+            'source_file', 'source_row_number', 'source_data'
+        ]
+        if output_file and summary_samples is not None:
+            sink = SummarySink(output_file, header, 0, 2, 3, 4, summary_samples)
+        elif output_file:
+            sink = ResultSink(output_file, header)
 
-        if os.path.isdir(file_path):
-            for root, _, files in os.walk(file_path):
-                for file_name in files:
-                    file_to_search = os.path.join(root, file_name)
-                    print(f"Processing file: {file_to_search}")
-                    for pattern, description in regex_patterns.items():
-                        search_in_single_file(
-                            file_to_search, pattern, description, output_csv
-                        )
-        elif os.path.isfile(file_path):
-            print(f"Processing file: {file_path}")
-            for pattern, description in regex_patterns.items():
-                search_in_single_file(file_path, pattern, description, output_csv)
-        else:
-            print("Invalid path provided.")
+        tasks = plan_indexed_ranges(file_path, [required_literals(pattern) for pattern in regex_patterns])
+        cache = ResultCache('regex', regex_patterns) if summary_samples is None else None
+        scan_input(file_path, search_in_single_file, (scanner,), sink, workers,
+                   line_column=3, tasks=tasks, cache=cache)
+        for index in scanner.quarantined:
+            print(f"Quarantined (matches after it ran out of time are missing): {scanner.patterns[index][0]}")
     except Exception as e:
         print(f"An error occurred: {e}")
+    finally:
+        if sink:
+            sink.close()
 
-def search_in_single_file(file_path, regex_pattern, pattern_description, output_csv=None):
+def search_in_single_file(file_path, scanner, start=0, end=None):
     """
-    Searches for a given regex_pattern in a single file. Appends the match info to a CSV if specified.
+    Searches a single file, or its byte range [start, end), for every pattern of `scanner`
+    (a RegexScanner) in one pass.
+    Returns (rows, line_count, complete) with one row per (pattern, matching line), line numbers
+    counted from `start`; complete is False if the range could not be read to the end or a
+    quarantined pattern was skipped on some line, so such results are not cached.
     """
+    rows = []
+    line_number = 0
+    complete = True
+    skipped = scanner.skipped
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line_number, line in enumerate(file, start=1):
-                if re.search(regex_pattern, line):
-                    if output_csv:
-                        with open(output_csv, 'a', newline='', encoding='utf-8') as csv_file:
-                            csv_writer = csv.writer(csv_file)
-                            csv_writer.writerow([
-                                regex_pattern, pattern_description,
-                                file_path, line_number, line.strip()
-                            ])
+        for line_number, line in enumerate(iter_range_lines(file_path, start, end), start=1):
+            for regex_pattern, pattern_description in scanner.match(line):
+                rows.append([
+                    regex_pattern, pattern_description,
+                    file_path, line_number, line.strip()
+                ])
+        complete = scanner.skipped == skipped
     except Exception as e:
         print(f"An error occurred while processing {file_path}: {e}")
+        line_number = count_range_lines(file_path, start, end)
+        complete = False
+    return rows, line_number, complete
 
 if __name__ == "__main__":
     # Predefined paths
@@ -63,9 +83,6 @@ if __name__ == "__main__":
     base_dir = dirs['base_dir']
 
     input_regex_file = os.path.join(base_dir, "input_regex.txt")
-    default_output_csv_path = os.path.join(
-        default_output_directory, f"{datetime.now().strftime('%Y%m%d%H%M%S')}_regex.csv"
-    )
 
     # Load regex patterns from input_regex.txt
     try:
@@ -78,6 +95,12 @@ if __name__ == "__main__":
         print(f"Regex file not found: {input_regex_file}")
         exit(1)
 
+    summary_samples = prompt_summary_mode()
+    output_format = prompt_output_format()
+    default_output_path = build_output_path(
+        default_output_directory, f"{datetime.now().strftime('%Y%m%d%H%M%S')}_regex", output_format
+    )
+
     # Predefined paths
-    output_csv = default_output_csv_path
-    freetext(default_input_directory, regex_patterns, output_csv)
+    output_file = default_output_path
+    freetext(default_input_directory, regex_patterns, output_file, summary_samples=summary_samples)
@@ -1,52 +1,63 @@
 import os
-import csv
 from datetime import datetime
 
 from common_paths import get_toolkit_dirs
+from common_matchers import WordlistMatcher
+from common_output import ResultSink, SummarySink, build_output_path, prompt_output_format, prompt_summary_mode
+from common_scan import DEFAULT_WORKERS, scan_input, iter_range_lines, count_range_lines
+from common_index import plan_indexed_ranges
+from common_cache import ResultCache
 
-def freetext(file_path, search_queries, output_csv=None):
+def freetext(file_path, search_queries, output_file=None, workers=DEFAULT_WORKERS, summary_samples=None):
     """
     Performs a wordlist-based search on the given file_path (file or directory).
-    Logs matches to a CSV file if specified.
+    Logs matches to an output file (CSV, JSONL or Parquet) if specified.
+    The wordlist is compiled into a single matcher, so each file is read only once.
+    Files, and byte ranges of large files, are scanned in parallel across `workers` processes.
+    If a trigram index exists in tmp/, only the blocks that can contain a term are scanned.
+    With summary_samples set (a number of sample rows, possibly 0), only counts per (term, file)
+    and per (term, hour) are written; the result cache is not used in that mode.
     """
+    sink = None
     try:
-        if output_csv:
-            with open(output_csv, 'w', newline='', encoding='utf-8') as csv_file:
-                csv_writer = csv.writer(csv_file)
-                csv_writer.writerow(['search_query', 'source_file', 'source_row_number', 'source_data'])
+        matcher = WordlistMatcher(search_queries)
 
-        # Search all files
-        if os.path.isdir(file_path):
-            for root, _, files in os.walk(file_path):
-                for file_name in files:
-                    file_to_search = os.path.join(root, file_name)
-                    print(f"Processing file: {file_to_search}")
-                    for search_query in search_queries:
-                        search_in_single_file(file_to_search, search_query, output_csv)
-        elif os.path.isfile(file_path):
-            print(f"Processing file: {file_path}")
-            for search_query in search_queries:
-                search_in_single_file(file_path, search_query, output_csv)
-        else:
-            print("Invalid path provided.")
+        header = ['search_query', 'source_file', 'source_row_number', 'source_data']
+        if output_file and summary_samples is not None:
+            sink = SummarySink(output_file, header, 0, 1, 2, 3, summary_samples)
+        elif output_file:
+            sink = ResultSink(output_file, header)
+
+        # Search all files, or only the candidate blocks of the index
+        tasks = plan_indexed_ranges(file_path, [[search_query] for search_query in search_queries])
+        cache = ResultCache('wordlist', search_queries) if summary_samples is None else None
+        scan_input(file_path, search_in_single_file, (matcher,), sink, workers,
+                   line_column=2, tasks=tasks, cache=cache)
     except Exception as e:
         print(f"An error occurred: {e}")
+    finally:
+        if sink:
+            sink.close()
 
-def search_in_single_file(file_path, search_query, output_csv=None):
+def search_in_single_file(file_path, matcher, start=0, end=None):
     """
-    Searches for `search_query` in a single file.  
-    Appends matches to CSV if specified.
+    Searches a single file, or its byte range [start, end), for every term of `matcher`
+    (a WordlistMatcher) in one pass.
+    Returns (rows, line_count, complete) with one row per (term, matching line), line numbers counted
+    from `start`; complete is False if the range could not be read to the end.
     """
+    rows = []
+    line_number = 0
+    complete = True
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line_number, line in enumerate(file, start=1):
-                if search_query.lower() in line.lower():
-                    if output_csv:
-                        with open(output_csv, 'a', newline='', encoding='utf-8') as csv_file:
-                            csv_writer = csv.writer(csv_file)
-                            csv_writer.writerow([search_query, file_path, line_number, line.strip()])
+        for line_number, line in enumerate(iter_range_lines(file_path, start, end), start=1):
+            for search_query in matcher.match(line):
+                rows.append([search_query, file_path, line_number, line.strip()])
     except Exception as e:
         print(f"An error occurred while processing {file_path}: {e}")
+        line_number = count_range_lines(file_path, start, end)
+        complete = False
+    return rows, line_number, complete
 
 if __name__ == "__main__":
     # Default paths
@@ -66,9 +77,14 @@ if __name__ == "__main__":
         print(f"Wordlist file not found: {input_wordlist_file}")
         exit(1)
 
-    # Build CSV
+    summary_samples = prompt_summary_mode()
+    output_format = prompt_output_format()
+
+    # Build output path
     current_datetime = datetime.now().strftime("%Y%m%d%H%M%S")
-    default_output_csv = os.path.join(default_output_directory, f"{current_datetime}_wordlist.csv")
+    default_output_file = build_output_path(
+        default_output_directory, f"{current_datetime}_wordlist", output_format
+    )
 
     # Run search
-    freetext(default_input_directory, search_queries, default_output_csv)
+    freetext(default_input_directory, search_queries, default_output_file, summary_samples=summary_samples)